@@ -0,0 +1,805 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import cv2
+from PIL import Image
+
+
+def to_gray_array(image):
+    """把 PIL 图像或 numpy 数组转换为 uint8 灰度数组（已是灰度数组时不复制）"""
+    if isinstance(image, Image.Image):
+        if image.mode != 'L':
+            image = image.convert('L')
+        return np.asarray(image, dtype=np.uint8)
+
+    array = np.asarray(image)
+    if array.ndim == 3:
+        code = cv2.COLOR_RGBA2GRAY if array.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+        array = cv2.cvtColor(array, code)
+    if array.dtype != np.uint8:
+        array = array.astype(np.uint8)
+    return array
+
+
+def frame_digest(image):
+    """像素内容的精确摘要：只有完全相同的图像摘要才相同"""
+    gray = np.ascontiguousarray(to_gray_array(image))
+    return hashlib.blake2b(gray.tobytes(), digest_size=16).digest()
+
+
+class FrameChangeDetector:
+    """
+    基于帧差分的画面变化检测。
+    帧先缩小为缩略图再做 absdiff，超过亮度阈值的像素比例达到 change_ratio 即视为变化。
+    """
+
+    def __init__(self, thumb_width=320, pixel_threshold=24, change_ratio=0.002):
+        self.thumb_width = thumb_width
+        self.pixel_threshold = pixel_threshold
+        self.change_ratio = change_ratio
+        self.previous = None  # 上一次采样的缩略图
+        self.reference = None  # 上一次送去 OCR 的缩略图
+
+    def thumbnail(self, image):
+        gray = to_gray_array(image)
+        height, width = gray.shape[:2]
+        if width <= self.thumb_width:
+            return gray.copy()
+        thumb_height = max(1, int(height * self.thumb_width / width))
+        return cv2.resize(gray, (self.thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+
+    def difference(self, thumb_a, thumb_b):
+        """返回两张缩略图之间发生变化的像素比例"""
+        if thumb_a is None or thumb_b is None or thumb_a.shape != thumb_b.shape:
+            return 1.0
+        diff = cv2.absdiff(thumb_a, thumb_b)
+        return np.count_nonzero(diff > self.pixel_threshold) / diff.size
+
+    def update(self, image):
+        """
+        记录新的采样帧。
+        返回 (缩略图, 相对上一帧是否变化)
+        """
+        thumb = self.thumbnail(image)
+        changed = self.difference(thumb, self.previous) >= self.change_ratio
+        self.previous = thumb
+        return thumb, changed
+
+    def differs_from_reference(self, thumb):
+        """判断缩略图是否与上一次 OCR 的画面不同"""
+        return self.difference(thumb, self.reference) >= self.change_ratio
+
+    def set_reference(self, thumb):
+        self.reference = thumb
+
+    def reset(self):
+        self.previous = None
+        self.reference = None
+
+
+# --- 文本存在性预判 ---
+
+class TextPresenceClassifier:
+    """
+    在完整 OCR 之前判断画面里是否可能有文字，只用向量化的统计量，1080p 的画面也在一毫秒以内。
+    画面按整数步长抽样成缩略图，再按 tile_size 分块，逐块计算下列统计量，任意一块符合文字特征即判定为有文字
+    （截图区域通常比文字大得多，整幅图的统计量会被大片背景稀释）：
+    - 亮度方差：空白/纯色块没有文本；
+    - 边缘密度：边缘太少没有字符，太多则是噪点或纹理；
+    - 边缘方向平衡：文字同时有水平和竖直方向的笔画边缘，单一方向的条纹不是文字；
+    - 笔画宽度：用 “笔画像素面积 / 边缘长度” 估计平均笔画宽度，大面积色块不是文字。
+    边缘阈值随块的对比度变化（块标准差的 edge_contrast_ratio 倍，限制在 min_edge_threshold 到
+    edge_threshold 之间），灰底上的低对比度文字也能检出。
+    各块的统计量直接在缩略图上用积分图和逐行广播的比较求出，不展开回整幅图像。
+    """
+
+    def __init__(self, max_width=480, tile_size=32, min_std=6.0, edge_threshold=32, min_edge_threshold=8,
+                 edge_contrast_ratio=0.75, min_edge_density=0.004, max_edge_density=0.35,
+                 min_orientation_balance=0.15, max_stroke_width=20.0):
+        self.max_width = max_width  # 按整数步长抽样到不超过该宽度
+        self.tile_size = tile_size  # 抽样后图像中分块的边长
+        self.min_std = min_std
+        self.edge_threshold = edge_threshold  # 边缘阈值上限（高对比度画面）
+        self.min_edge_threshold = min_edge_threshold  # 边缘阈值下限，避免把压缩噪声当作边缘
+        self.edge_contrast_ratio = edge_contrast_ratio
+        self.min_edge_density = min_edge_density
+        self.max_edge_density = max_edge_density
+        self.min_orientation_balance = min_orientation_balance
+        self.max_stroke_width = max_stroke_width  # 原图像素
+        self.last_features = None
+        self.last_ms = 0.0
+        self.checked = 0
+        self.rejected = 0
+
+    @staticmethod
+    def _tile_sums(integral, rows, cols, tile_h, tile_w):
+        """由积分图求每块的和"""
+        grid = integral[0:rows * tile_h + 1:tile_h, 0:cols * tile_w + 1:tile_w]
+        return grid[1:, 1:] - grid[:-1, 1:] - grid[1:, :-1] + grid[:-1, :-1]
+
+    def _tile_counts(self, mask, rows, cols, tile_h, tile_w):
+        """布尔掩码 -> 每块为真的像素数（积分图比 numpy 按轴求和快得多）"""
+        integral = cv2.integral(mask.view(np.uint8).reshape(rows * tile_h, cols * tile_w), sdepth=cv2.CV_32S)
+        return self._tile_sums(integral, rows, cols, tile_h, tile_w)
+
+    @staticmethod
+    def _row_thresholds(values, tile_w):
+        """每块一个阈值 (行块, 列块) -> 可与 (行块, 块高, 宽) 视图逐行广播比较的 (行块, 1, 宽)"""
+        return np.repeat(values, tile_w, axis=1)[:, None, :]
+
+    def features(self, image):
+        """
+        逐块计算判定用的统计量，返回最像文字的一块的统计量：
+        有符合条件的块时返回该块，否则返回边缘最多的块（用于日志）。
+        """
+        gray = to_gray_array(image)
+        step = max(1, -(-gray.shape[1] // self.max_width))
+        features = {'std': 0.0, 'edge_density': 0.0, 'balance': 0.0, 'stroke_width': 0.0,
+                    'passed': False, 'tiles': 0}
+        height, width = -(-gray.shape[0] // step), -(-gray.shape[1] // step)
+        rows, cols = max(1, height // self.tile_size), max(1, width // self.tile_size)
+        # 每块大小相同（边长取偶数，方差和笔画像素在隔行隔列的四分之一抽样上统计），
+        # 最后不足一块的几行/几列舍去，分块都是整齐的视图
+        tile_h, tile_w = height // rows // 2 * 2, width // cols // 2 * 2
+        if tile_h < 2 or tile_w < 2:
+            return features
+        small = np.ascontiguousarray(gray[:rows * tile_h * step:step, :cols * tile_w * step:step])
+        features['tiles'] = rows * cols
+        shape = (rows, tile_h, cols * tile_w)
+
+        # 亮度均值/方差：积分图按块求和，全程整数（平方和用 float64 积分图，不会溢出）
+        quarter = np.ascontiguousarray(small[::2, ::2])
+        half_h, half_w = tile_h // 2, tile_w // 2
+        count = half_h * half_w
+        sums, squares = cv2.integral2(quarter, sdepth=cv2.CV_32S, sqdepth=cv2.CV_64F)
+        mean = self._tile_sums(sums, rows, cols, half_h, half_w) / count
+        std = np.sqrt(np.maximum(self._tile_sums(squares, rows, cols, half_h, half_w) / count - mean * mean, 0))
+
+        # 边缘：相邻像素差（块内第一列/第一行为 0）与各块自己的阈值比较
+        threshold = self._row_thresholds(np.clip(std * self.edge_contrast_ratio, self.min_edge_threshold,
+                                                 self.edge_threshold).astype(np.uint8), tile_w)
+        diff = np.zeros_like(small)
+        cv2.absdiff(small[:, 1:], small[:, :-1], dst=diff[:, 1:])
+        horizontal = self._tile_counts(diff.reshape(shape) > threshold, rows, cols, tile_h, tile_w)
+        diff[:, 1:] = 0
+        cv2.absdiff(small[1:], small[:-1], dst=diff[1:])
+        vertical = self._tile_counts(diff.reshape(shape) > threshold, rows, cols, tile_h, tile_w)
+        edges = horizontal + vertical
+        edge_density = edges / (2.0 * tile_h * tile_w)
+        balance = np.minimum(horizontal, vertical) / np.maximum(np.maximum(horizontal, vertical), 1)
+
+        # 笔画像素取偏离块均值较多且占少数的一侧（深色字或浅色字）；
+        # 背景是纯白/纯黑时背景一侧没有像素，此时取另一侧。在四分之一抽样上计数后放大 4 倍
+        quarter_shape = (rows, half_h, cols * half_w)
+        low = self._row_thresholds(np.clip(mean - 0.5 * std, 0, 255).astype(np.uint8), half_w)
+        high = self._row_thresholds(np.clip(np.ceil(mean + 0.5 * std), 0, 255).astype(np.uint8), half_w)
+        dark = self._tile_counts(quarter.reshape(quarter_shape) < low, rows, cols, half_h, half_w)
+        light = self._tile_counts(quarter.reshape(quarter_shape) > high, rows, cols, half_h, half_w)
+        ink = 4 * np.where(np.minimum(dark, light) > 0, np.minimum(dark, light), np.maximum(dark, light))
+        stroke_width = 2.0 * ink / np.maximum(edges, 1) * step
+
+        passed = ((std >= self.min_std)
+                  & (edge_density >= self.min_edge_density) & (edge_density <= self.max_edge_density)
+                  & (balance >= self.min_orientation_balance)
+                  & (edges > 0) & (stroke_width <= self.max_stroke_width))
+        if passed.any():
+            index = np.unravel_index(np.argmax(np.where(passed, edge_density, -1)), passed.shape)
+        else:
+            index = np.unravel_index(np.argmax(edge_density), edge_density.shape)
+        features.update({
+            'std': float(std[index]),
+            'edge_density': float(edge_density[index]),
+            'balance': float(balance[index]),
+            'stroke_width': float(stroke_width[index]),
+            'passed': bool(passed.any()),
+        })
+        return features
+
+    def has_text(self, image):
+        """画面中可能有文字时返回 True"""
+        start = time.perf_counter()
+        features = self.features(image)
+        result = features['passed']
+        self.last_features = features
+        self.last_ms = (time.perf_counter() - start) * 1000
+        self.checked += 1
+        self.rejected += not result
+        return result
+
+    def describe(self):
+        """最近一次判定的统计量（用于日志）"""
+        features = self.last_features or {}
+        return (f"方差 {features.get('std', 0):.1f}, 边缘密度 {features.get('edge_density', 0):.3f}, "
+                f"方向平衡 {features.get('balance', 0):.2f}, 笔画宽度 {features.get('stroke_width', 0):.1f}px, "
+                f"分块 {features.get('tiles', 0)}, 耗时 {self.last_ms:.2f}ms")
+
+
+# --- 文本区域检测 ---
+
+class TextRegionDetector:
+    """
+    快速文本定位：形态学梯度 + Otsu 二值化 + 水平闭运算把字符连成行，
+    再用连通域统计得到每一行的紧凑边框。整幅图没有足够强的边缘时直接判定为无文本。
+    Otsu 阈值的下限随画面的梯度幅度变化（最强的千分之一梯度的 gradient_ratio 倍，不超过 min_gradient），
+    灰底上的低对比度文字（如 120/170）也能定位；最强梯度不到 min_contrast 的画面只有噪声。
+    """
+
+    def __init__(self, min_gradient=24, min_contrast=16, gradient_ratio=0.35, min_height=6, min_width=6,
+                 min_fill=0.08, padding=4):
+        self.min_gradient = min_gradient  # 高对比度画面中 Otsu 阈值低于此值说明没有清晰的笔画边缘
+        self.min_contrast = min_contrast
+        self.gradient_ratio = gradient_ratio
+        self.min_height = min_height
+        self.min_width = min_width
+        self.min_fill = min_fill  # 连通域面积 / 边框面积 的下限，过滤稀疏噪点
+        self.padding = padding
+        self._gradient_kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+    def detect(self, image):
+        """返回从上到下排列的文本行边框列表 [(x, y, w, h), ...]，无文本时返回空列表"""
+        gray = to_gray_array(image)
+        height, width = gray.shape[:2]
+        if height < self.min_height or width < self.min_width:
+            return []
+
+        gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, self._gradient_kernel)
+        threshold, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        if threshold < self.min_gradient:
+            # 阈值按画面自身的梯度幅度缩放，而不是固定值
+            histogram = cv2.calcHist([gradient], [0], None, [256], [0, 256]).ravel().cumsum()
+            contrast = int(np.searchsorted(histogram, histogram[-1] * 0.999))
+            if contrast < self.min_contrast or threshold < contrast * self.gradient_ratio:
+                return []
+
+        # 水平方向闭运算的宽度随区域高度变化，把同一行的字符连起来
+        link_width = max(9, min(width // 20, 41))
+        link_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (link_width, 1))
+        cv2.morphologyEx(binary, cv2.MORPH_CLOSE, link_kernel, dst=binary)
+
+        count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        if count <= 1:
+            return []
+        stats = stats[1:]
+        xs, ys, ws, hs, areas = stats[:, 0], stats[:, 1], stats[:, 2], stats[:, 3], stats[:, 4]
+        keep = (hs >= self.min_height) & (ws >= self.min_width) & (areas >= self.min_fill * ws * hs)
+        # 几乎占满整个区域的连通域通常是边框或背景纹理
+        keep &= ~((ws >= width * 0.98) & (hs >= height * 0.9))
+        boxes = [tuple(int(v) for v in box) for box in np.stack((xs, ys, ws, hs), axis=1)[keep]]
+        return self._pad(self._merge_lines(boxes), width, height)
+
+    def _merge_lines(self, boxes):
+        """把垂直方向重叠超过一半的边框合并为同一行"""
+        lines = []
+        for x, y, w, h in sorted(boxes, key=lambda b: b[1] + b[3] / 2):
+            if lines:
+                lx, ly, lw, lh = lines[-1]
+                overlap = min(ly + lh, y + h) - max(ly, y)
+                if overlap > 0.5 * min(lh, h):
+                    nx, ny = min(lx, x), min(ly, y)
+                    lines[-1] = (nx, ny, max(lx + lw, x + w) - nx, max(ly + lh, y + h) - ny)
+                    continue
+            lines.append((x, y, w, h))
+        return lines
+
+    def _pad(self, boxes, width, height):
+        padded = []
+        for x, y, w, h in boxes:
+            x1, y1 = max(0, x - self.padding), max(0, y - self.padding)
+            x2, y2 = min(width, x + w + self.padding), min(height, y + h + self.padding)
+            padded.append((x1, y1, x2 - x1, y2 - y1))
+        return padded
+
+
+def union_box(boxes):
+    """多个边框的外接矩形"""
+    x1 = min(x for x, _, _, _ in boxes)
+    y1 = min(y for _, y, _, _ in boxes)
+    x2 = max(x + w for x, _, w, _ in boxes)
+    y2 = max(y + h for _, y, _, h in boxes)
+    return x1, y1, x2 - x1, y2 - y1
+
+
+def group_line_boxes(lines, groups):
+    """把从上到下排列的文本行按顺序分成最多 groups 组，返回每组的外接矩形（用于分给多个进程并行识别）"""
+    if not lines:
+        return []
+    groups = max(1, min(groups, len(lines)))
+    size, extra = divmod(len(lines), groups)
+    boxes = []
+    start = 0
+    for index in range(groups):
+        end = start + size + (1 if index < extra else 0)
+        boxes.append(union_box(lines[start:end]))
+        start = end
+    return boxes
+
+
+def crop_box(gray, box):
+    """按 (x, y, w, h) 裁剪灰度数组（返回视图）"""
+    x, y, w, h = box
+    return gray[y:y + h, x:x + w]
+
+
+class TextHeightNormalizer:
+    """
+    文字高度归一化：用连通域估计主要字形高度，把图像缩放到 Tesseract 最擅长的
+    字高（约 20-30 像素）。大字幕缩小可以减少像素数，小字体放大可以提高准确率。
+    每个区域的缩放系数会被缓存，每隔 reestimate_interval 次才重新估计。
+    """
+
+    def __init__(self, target_height=24, sweet_spot=(20, 30), min_scale=0.25, max_scale=4.0,
+                 reestimate_interval=50):
+        self.target_height = target_height
+        self.sweet_spot = sweet_spot
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.reestimate_interval = reestimate_interval
+        self._region_scales = {}  # 区域 -> [缩放系数, 已使用次数]
+        self._lock = threading.Lock()
+
+    def estimate_glyph_height(self, image):
+        """估计主要字形高度（连通域高度的中位数），无法估计时返回 None"""
+        gray = to_gray_array(image)
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # 文字通常是少数像素：前景占多数时反转极性
+        if cv2.countNonZero(binary) > binary.size // 2:
+            cv2.bitwise_not(binary, dst=binary)
+
+        count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        if count <= 1:
+            return None
+        widths, heights = stats[1:, cv2.CC_STAT_WIDTH], stats[1:, cv2.CC_STAT_HEIGHT]
+        # 排除噪点、整行粘连的连通域和接近整幅高度的背景块
+        keep = (heights >= 4) & (heights <= gray.shape[0] * 0.9) & (widths <= heights * 3)
+        if not np.any(keep):
+            return None
+        return float(np.median(heights[keep]))
+
+    def compute_scale(self, image):
+        glyph_height = self.estimate_glyph_height(image)
+        if glyph_height is None:
+            return 1.0
+        low, high = self.sweet_spot
+        if low <= glyph_height <= high:
+            return 1.0
+        return float(np.clip(self.target_height / glyph_height, self.min_scale, self.max_scale))
+
+    def get_scale(self, image, region_key=None):
+        """取得区域的缩放系数（必要时重新估计）"""
+        if region_key is None:
+            return self.compute_scale(image)
+        with self._lock:
+            entry = self._region_scales.get(region_key)
+            if entry is not None and entry[1] < self.reestimate_interval:
+                entry[1] += 1
+                return entry[0]
+
+        scale = self.compute_scale(image)
+        with self._lock:
+            self._region_scales[region_key] = [scale, 1]
+        print(f"区域 {region_key} 的文字缩放系数: {scale:.2f}")
+        return scale
+
+    def forget(self, region_key=None):
+        with self._lock:
+            if region_key is None:
+                self._region_scales.clear()
+            else:
+                self._region_scales.pop(region_key, None)
+
+    def normalize(self, image, region_key=None):
+        """返回 (缩放后的灰度数组, 缩放系数)"""
+        gray = to_gray_array(image)
+        scale = self.get_scale(gray, region_key)
+        if abs(scale - 1.0) < 0.05:
+            return gray, 1.0
+        height, width = gray.shape[:2]
+        size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+        return cv2.resize(gray, size, interpolation=interpolation), scale
+
+
+# --- 字幕颜色抠图 ---
+
+def to_rgb_array(image):
+    """把 PIL 图像或 numpy 数组转换为 (高, 宽, 3) 的 uint8 数组；灰度图返回 None"""
+    if isinstance(image, Image.Image):
+        if image.mode in ('L', '1', 'P'):
+            return None
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return np.asarray(image, dtype=np.uint8)
+    array = np.asarray(image)
+    if array.ndim != 3:
+        return None
+    if array.shape[2] == 4:
+        return cv2.cvtColor(array, cv2.COLOR_RGBA2RGB)
+    return array
+
+
+class SubtitleColorKeyer:
+    """
+    字幕颜色抠图：游戏和视频字幕通常是固定颜色（常带描边）。
+    第一次识别成功后，在 OCR 给出的文字框内用 k-means 聚类颜色，选出 “框内常见、框外少见”
+    的颜色作为该区域的文字颜色；之后的帧只需一次 cv2.inRange 按颜色距离取出文字，
+    得到白底黑字的干净图像，代价远低于 fastNlMeansDenoising。
+    连续多帧抠不出文字（字幕颜色变了）时丢弃模型，等待重新学习。
+    """
+
+    def __init__(self, clusters=3, tolerance_scale=2.5, min_tolerance=24, max_tolerance=72,
+                 min_ink_ratio=0.002, max_ink_ratio=0.5, min_score=2.0, max_samples=20000, max_misses=3):
+        self.clusters = clusters
+        self.tolerance_scale = tolerance_scale  # 每个通道的容差 = 聚类标准差 × 该系数
+        self.min_tolerance = min_tolerance
+        self.max_tolerance = max_tolerance
+        self.min_ink_ratio = min_ink_ratio  # 抠出的文字像素比例低于该值视为失败
+        self.max_ink_ratio = max_ink_ratio  # 高于该值说明背景也是同一颜色
+        self.min_score = min_score  # 文字颜色在框内出现的频率至少是框外的几倍
+        self.max_samples = max_samples
+        self.max_misses = max_misses
+        self.models = {}  # 区域 -> (下界, 上界)
+        self._misses = {}
+        self._lock = threading.Lock()
+
+    def has_model(self, region_key=None):
+        with self._lock:
+            return region_key in self.models
+
+    def _sample(self, pixels):
+        step = max(1, len(pixels) // self.max_samples)
+        return np.ascontiguousarray(pixels[::step])
+
+    def learn(self, image, boxes, region_key=None):
+        """
+        用 OCR 确认过的文字框 [(x, y, w, h), ...]（原图坐标）学习文字颜色。
+        学习成功返回 True。
+        """
+        rgb = to_rgb_array(image)
+        if rgb is None or not boxes:
+            return False
+
+        inside_mask = np.zeros(rgb.shape[:2], dtype=bool)
+        for x, y, w, h in boxes:
+            inside_mask[max(0, y):max(0, y + h), max(0, x):max(0, x + w)] = True
+        inside = self._sample(rgb[inside_mask])
+        outside = self._sample(rgb[~inside_mask])
+        if len(inside) < 50:
+            return False
+
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
+        clusters = min(self.clusters, len(inside))
+        _, labels, centers = cv2.kmeans(inside.astype(np.float32), clusters, None, criteria, 1,
+                                        cv2.KMEANS_PP_CENTERS)
+        labels = labels.ravel()
+
+        best = None
+        for index, center in enumerate(centers):
+            members = inside[labels == index]
+            if len(members) < 10:
+                continue
+            tolerance = np.clip(members.std(axis=0) * self.tolerance_scale, self.min_tolerance, self.max_tolerance)
+            lower = np.clip(center - tolerance, 0, 255).astype(np.uint8)
+            upper = np.clip(center + tolerance, 0, 255).astype(np.uint8)
+            inside_ratio = cv2.countNonZero(cv2.inRange(inside.reshape(-1, 1, 3), lower, upper)) / len(inside)
+            outside_ratio = (cv2.countNonZero(cv2.inRange(outside.reshape(-1, 1, 3), lower, upper)) / len(outside)
+                             if len(outside) else 0.0)
+            # 文字颜色：框内占一定比例但不是全部，且在框外明显更少
+            if not 0.02 <= inside_ratio <= 0.7:
+                continue
+            score = inside_ratio / (outside_ratio + 0.01)
+            if score >= self.min_score and (best is None or score > best[0]):
+                best = (score, lower, upper, center)
+
+        if best is None:
+            print("字幕颜色学习失败: 文字框内没有明显区别于背景的颜色")
+            return False
+
+        score, lower, upper, center = best
+        with self._lock:
+            self.models[region_key] = (lower, upper)
+            self._misses.pop(region_key, None)
+        print(f"区域 {region_key} 学到字幕颜色 RGB{tuple(int(c) for c in center)}，"
+              f"容差 {tuple(int(u) - int(l) for l, u in zip(lower, upper))}，区分度 {score:.1f}")
+        return True
+
+    def apply(self, image, region_key=None):
+        """
+        按学到的颜色抠出文字，返回白底黑字的灰度数组；没有模型或抠图失败时返回 None
+        """
+        with self._lock:
+            model = self.models.get(region_key)
+        if model is None:
+            return None
+        rgb = to_rgb_array(image)
+        if rgb is None:
+            return None
+
+        mask = cv2.inRange(rgb, model[0], model[1])
+        ink_ratio = cv2.countNonZero(mask) / mask.size
+        if not self.min_ink_ratio <= ink_ratio <= self.max_ink_ratio:
+            with self._lock:
+                misses = self._misses.get(region_key, 0) + 1
+                self._misses[region_key] = misses
+                if misses >= self.max_misses:
+                    self.models.pop(region_key, None)
+                    self._misses.pop(region_key, None)
+                    print(f"区域 {region_key} 的字幕颜色连续 {misses} 次失配，重新学习")
+            return None
+
+        with self._lock:
+            self._misses.pop(region_key, None)
+        return cv2.bitwise_not(mask)
+
+    def forget(self, region_key=None):
+        with self._lock:
+            if region_key is None:
+                self.models.clear()
+                self._misses.clear()
+            else:
+                self.models.pop(region_key, None)
+                self._misses.pop(region_key, None)
+
+
+# --- 预处理流水线 ---
+
+class PreprocessBuffers:
+    """
+    跨帧复用的 uint8 工作缓冲区。
+    a / b 供各阶段交替作为输出，scratch 供阶段内部的中间结果，lut 为 256 项查找表。
+    底层是按容量分配的一维数组，a / b / scratch 是其中当前尺寸的连续视图：
+    监视模式下截图区域的尺寸每帧都可能变化，只要不超过容量就不会重新分配。
+    """
+
+    GROWTH = 1.25  # 扩容时预留的余量，尺寸缓慢增长时不必每帧重新分配
+
+    def __init__(self, shape=None):
+        self.shape = None
+        self.capacity = 0
+        self.reallocations = 0
+        self._stores = ()
+        self.lut = np.empty(256, dtype=np.uint8)
+        self.timings = []  # 本次 run 的阶段耗时，组合阶段在其中追加子阶段的耗时
+        if shape is not None:
+            self.fit(shape)
+
+    def fit(self, shape):
+        """把 a / b / scratch 调整为 shape 尺寸的视图，容量不足时才重新分配"""
+        if shape == self.shape:
+            return self
+        size = int(np.prod(shape))
+        if size > self.capacity:
+            self.capacity = int(size * self.GROWTH)
+            self._stores = tuple(np.empty(self.capacity, dtype=np.uint8) for _ in range(3))
+            self.reallocations += 1
+        self.a, self.b, self.scratch = (store[:size].reshape(shape) for store in self._stores)
+        self.shape = shape
+        return self
+
+    def other(self, array):
+        """返回与 array 不同的那个输出缓冲区"""
+        return self.b if array is self.a else self.a
+
+
+class PreprocessStage:
+    """
+    预处理阶段基类：把 src 处理后写入 dst（均为 uint8 灰度数组），返回保存结果的数组。
+    阶段可以使用 buffers.scratch / buffers.lut，但不能分配与图像同尺寸的临时数组。
+    """
+
+    name = "stage"
+
+    def apply(self, src, dst, buffers):
+        raise NotImplementedError
+
+    def apply_sub(self, stage, src, dst, buffers):
+        """组合阶段内部调用子阶段，耗时以 '组合阶段/子阶段' 的名字记入本次 run 的阶段耗时"""
+        start = time.perf_counter()
+        result = stage.apply(src, dst, buffers)
+        buffers.timings.append((f"{self.name}/{stage.name}", (time.perf_counter() - start) * 1000))
+        return result
+
+
+class ContrastStretch(PreprocessStage):
+    """按百分位拉伸对比度：用直方图求百分位，再用查找表映射，避免整幅图像的浮点运算"""
+
+    name = "contrast_stretch"
+
+    def __init__(self, low_percent=5, high_percent=95):
+        self.low_percent = low_percent
+        self.high_percent = high_percent
+        self._levels = np.arange(256, dtype=np.float32)
+
+    def apply(self, src, dst, buffers):
+        cdf = np.cumsum(cv2.calcHist([src], [0], None, [256], [0, 256]).ravel())
+        p_low = int(np.searchsorted(cdf, cdf[-1] * self.low_percent / 100.0))
+        p_high = int(np.searchsorted(cdf, cdf[-1] * self.high_percent / 100.0))
+        if p_high <= p_low:
+            return src
+        buffers.lut[:] = np.clip((self._levels - p_low) * (255.0 / (p_high - p_low)), 0, 255)
+        return cv2.LUT(src, buffers.lut, dst=dst)
+
+
+class AdaptiveThreshold(PreprocessStage):
+    """高斯自适应阈值，block_size 随图像尺寸变化"""
+
+    name = "adaptive_threshold"
+
+    def apply(self, src, dst, buffers):
+        block_size = max(15, int(min(src.shape[:2]) * 0.1)) | 1
+        return cv2.adaptiveThreshold(src, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                     block_size, 5, dst=dst)
+
+
+class EqualizeHist(PreprocessStage):
+    """直方图均衡化"""
+
+    name = "equalize_hist"
+
+    def apply(self, src, dst, buffers):
+        return cv2.equalizeHist(src, dst=dst)
+
+
+class Denoise(PreprocessStage):
+    """非局部均值去噪（代价较高，常需数十毫秒）"""
+
+    name = "denoise"
+
+    def __init__(self, strength=7, template_window=7, search_window=21):
+        self.strength = strength
+        self.template_window = template_window
+        self.search_window = search_window
+
+    def apply(self, src, dst, buffers):
+        return cv2.fastNlMeansDenoising(src, dst, self.strength, self.template_window, self.search_window)
+
+
+class OtsuThreshold(PreprocessStage):
+    """Otsu 全局二值化"""
+
+    name = "otsu_threshold"
+
+    def apply(self, src, dst, buffers):
+        _, binary = cv2.threshold(src, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=dst)
+        return binary
+
+
+class AutoBinarize(PreprocessStage):
+    """
+    根据亮度统计选择二值化方式：
+    低对比度 -> 拉伸 + 自适应阈值；过暗或过亮 -> 直方图均衡（可选去噪）；其余 -> Otsu
+    """
+
+    name = "auto_binarize"
+
+    def __init__(self, denoise=True):
+        self.denoise = Denoise() if denoise else None
+        self.stretch = ContrastStretch()
+        self.adaptive = AdaptiveThreshold()
+        self.equalize = EqualizeHist()
+        self.otsu = OtsuThreshold()
+        self.last_branch = None
+
+    def apply(self, src, dst, buffers):
+        # meanStdDev 不会像 np.std 那样分配整幅浮点临时数组
+        mean, std = cv2.meanStdDev(src)
+        mean_brightness, std_brightness = float(mean[0][0]), float(std[0][0])
+
+        if std_brightness < 25:  # 低对比度图像
+            self.last_branch = "low_contrast"
+            stretched = self.apply_sub(self.stretch, src, buffers.scratch, buffers)
+            return self.apply_sub(self.adaptive, stretched, dst, buffers)
+        if mean_brightness < 50 or mean_brightness > 200:  # 过暗或过亮
+            self.last_branch = "extreme_brightness"
+            if not self.denoise:
+                return self.apply_sub(self.equalize, src, dst, buffers)
+            equalized = self.apply_sub(self.equalize, src, buffers.scratch, buffers)
+            # fastNlMeansDenoising 通常占整个预处理耗时的大部分，单独计时便于定位
+            return self.apply_sub(self.denoise, equalized, dst, buffers)
+        self.last_branch = "normal"
+        return self.apply_sub(self.otsu, src, dst, buffers)
+
+
+class MorphClose(PreprocessStage):
+    """闭运算，连接断开的笔画"""
+
+    name = "morph_close"
+
+    def __init__(self, kernel_size=2):
+        self.kernel = np.ones((kernel_size, kernel_size), np.uint8)
+
+    def apply(self, src, dst, buffers):
+        return cv2.morphologyEx(src, cv2.MORPH_CLOSE, self.kernel, dst=dst)
+
+
+class Sharpen(PreprocessStage):
+    """3x3 锐化"""
+
+    name = "sharpen"
+
+    KERNEL = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]], dtype=np.float32)
+
+    def apply(self, src, dst, buffers):
+        return cv2.filter2D(src, -1, self.KERNEL, dst=dst)
+
+
+class PreprocessPipeline:
+    """
+    由多个预处理阶段组成的流水线，记录每个阶段的耗时。
+    工作缓冲区按 (截图区域, 线程) 分配并跨帧复用，区域尺寸变化时只调整视图，监视模式下内存占用保持平稳。
+    """
+
+    def __init__(self, name, stages, max_buffer_sets=8):
+        self.name = name
+        self.stages = list(stages)
+        self.max_buffer_sets = max_buffer_sets
+        self._buffers = OrderedDict()  # (截图区域, 线程ID) -> PreprocessBuffers
+        self._lock = threading.Lock()
+
+    def get_buffers(self, shape, region_key=None):
+        """取出（必要时创建）当前线程在该区域的缓冲区，并调整为 shape 尺寸"""
+        key = (region_key, threading.get_ident())
+        with self._lock:
+            buffers = self._buffers.get(key)
+            if buffers is None:
+                buffers = PreprocessBuffers()
+                self._buffers[key] = buffers
+                while len(self._buffers) > self.max_buffer_sets:
+                    self._buffers.popitem(last=False)
+            else:
+                self._buffers.move_to_end(key)
+        return buffers.fit(shape)
+
+    def run(self, image, region_key=None):
+        """
+        依次执行各阶段。
+        返回 (灰度数组, [(阶段名, 毫秒), ...])，组合阶段（如 auto_binarize）之后紧跟其子阶段的耗时；
+        返回的数组是复用的缓冲区，在同一线程下一次处理同一区域时会被覆盖，需要保留时请先拷贝。
+        """
+        gray = to_gray_array(image)
+        timings = []
+        if not self.stages:
+            return gray, timings
+
+        buffers = self.get_buffers(gray.shape, region_key)
+        buffers.timings = timings
+        for stage in self.stages:
+            index = len(timings)
+            start = time.perf_counter()
+            gray = stage.apply(gray, buffers.other(gray), buffers)
+            timings.insert(index, (stage.name, (time.perf_counter() - start) * 1000))
+        return gray, timings
+
+    def process(self, image):
+        """执行流水线并返回（独立拷贝的）PIL 图像"""
+        gray, _ = self.run(image)
+        return Image.fromarray(gray.copy())
+
+
+# 按代价从低到高排列的预处理方案
+PREPROCESS_PROFILES = ("none", "fast", "balanced", "best")
+
+
+def create_preprocess_pipeline(profile):
+    """
+    创建命名的预处理方案：
+    none - 不处理；fast - 仅 Otsu；balanced - 自动二值化（不去噪）+ 闭运算；
+    best - 自动二值化（含去噪）+ 闭运算 + 锐化
+    """
+    if profile == "none":
+        stages = []
+    elif profile == "fast":
+        stages = [OtsuThreshold()]
+    elif profile == "balanced":
+        stages = [AutoBinarize(denoise=False), MorphClose()]
+    elif profile == "best":
+        stages = [AutoBinarize(denoise=True), MorphClose(), Sharpen()]
+    else:
+        raise ValueError(f"未知的预处理方案: {profile}")
+    return PreprocessPipeline(profile, stages)
+
+
+def format_stage_timings(timings):
+    """把阶段耗时格式化为 'otsu_threshold 0.4ms, ...'"""
+    return ", ".join(f"{name} {ms:.1f}ms" for name, ms in timings) or "无"
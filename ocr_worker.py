@@ -0,0 +1,50 @@
+"""
+OCR 进程池的工作进程入口，由 ocr_engine.OCRProcessPool 以独立脚本启动。
+只导入识别所需的 ocr_engine，不会执行界面脚本；OMP_THREAD_LIMIT 由父进程通过子进程环境传入，
+在加载 Tesseract 之前就已生效，父进程自身的环境变量不受影响。
+父进程通过标准输入发送 pickle 序列化的任务，结果（8 字节长度 + pickle 数据）写回启动时复制出的原标准输出，
+识别过程中的 print 输出被转到标准错误，不会混进结果通道。
+"""
+import os
+import sys
+import pickle
+import struct
+
+
+def _portable(error):
+    """父进程不一定能还原的异常（构造参数不同等）改为 RuntimeError 传回"""
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+def main():
+    results = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    requests = sys.stdin.buffer
+
+    # 在重定向之后导入，模块加载时的提示信息输出到标准错误
+    from ocr_engine import run_pool_task
+
+    while True:
+        try:
+            task = pickle.load(requests)
+        except EOFError:
+            break  # 父进程关闭了管道
+        try:
+            reply = (True, run_pool_task(task))
+        except Exception as e:
+            reply = (False, _portable(e))
+        try:
+            data = pickle.dumps(reply, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            data = pickle.dumps((False, RuntimeError(f"工作进程结果无法序列化: {e}")))
+        results.write(struct.pack('<Q', len(data)))
+        results.write(data)
+        results.flush()
+
+
+if __name__ == "__main__":
+    main()
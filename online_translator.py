@@ -121,45 +121,55 @@ class OnlineTranslator:
         
         return False
     
+    def resolve_translator(self, from_lang, to_lang):
+        """返回翻译该语言对时首先使用的翻译器名称（当前翻译器不支持时换成支持的翻译器）"""
+        current_translator = self.translators[self.current_translator]
+        if (current_translator.is_language_supported(from_lang) and 
+                current_translator.is_language_supported(to_lang)):
+            return self.current_translator
+        for name, translator in self.translators.items():
+            if (translator.is_language_supported(from_lang) and 
+                translator.is_language_supported(to_lang)):
+                return name
+        # 如果没有翻译器明确支持，尝试使用当前翻译器（可能支持但未在列表中）
+        return self.current_translator
+    
     def translate(self, text, from_lang, to_lang):
         """翻译文本"""
+        return self.translate_with_engine(text, from_lang, to_lang)[0]
+    
+    def translate_with_engine(self, text, from_lang, to_lang):
+        """翻译文本，返回 (译文, 实际给出译文的翻译器名称)：自动切换或改用备用翻译器时与当前翻译器不同"""
         if not text or not text.strip():
-            return ""
+            return "", self.current_translator
         
         # 检查当前翻译器是否支持该语言对
-        current_translator = self.translators[self.current_translator]
-        if not (current_translator.is_language_supported(from_lang) and 
-                current_translator.is_language_supported(to_lang)):
-            # 寻找支持该语言对的翻译器
-            for name, translator in self.translators.items():
-                if (translator.is_language_supported(from_lang) and 
-                    translator.is_language_supported(to_lang)):
-                    print(f"自动切换到翻译器: {name}（支持 {from_lang}->{to_lang}）")
-                    self.current_translator = name
-                    current_translator = translator
-                    break
-            else:
-                # 如果没有翻译器明确支持，尝试使用当前翻译器（可能支持但未在列表中）
-                print(f"警告：没有翻译器明确支持语言对 {from_lang}->{to_lang}，尝试使用当前翻译器")
-        
-        translator = self.translators[self.current_translator]
+        name = self.resolve_translator(from_lang, to_lang)
+        if name != self.current_translator:
+            print(f"自动切换到翻译器: {name}（支持 {from_lang}->{to_lang}）")
+            self.current_translator = name
+        elif not (self.translators[name].is_language_supported(from_lang) and 
+                  self.translators[name].is_language_supported(to_lang)):
+            print(f"警告：没有翻译器明确支持语言对 {from_lang}->{to_lang}，尝试使用当前翻译器")
+        
+        translator = self.translators[name]
         try:
-            print(f"使用翻译引擎: {self.current_translator}")
+            print(f"使用翻译引擎: {name}")
             result = translator.translate(text, from_lang, to_lang)
-            return result
+            return result, name
         except Exception as e:
-            print(f"翻译失败 ({self.current_translator}): {e}")
+            print(f"翻译失败 ({name}): {e}")
             # 按优先级尝试备用翻译器
             fallback_order = ['libretranslate', 'mymemory', 'google', 'deepl', 'microsoft', 'baidu']
             
-            for name in fallback_order:
-                if name != self.current_translator and name in self.translators:
+            for backup_name in fallback_order:
+                if backup_name != name and backup_name in self.translators:
                     try:
-                        print(f"尝试备用翻译器: {name}")
-                        result = self.translators[name].translate(text, from_lang, to_lang)
-                        return result
+                        print(f"尝试备用翻译器: {backup_name}")
+                        result = self.translators[backup_name].translate(text, from_lang, to_lang)
+                        return result, backup_name
                     except Exception as backup_error:
-                        print(f"备用翻译器 {name} 失败: {backup_error}")
+                        print(f"备用翻译器 {backup_name} 失败: {backup_error}")
                         continue
             
             raise Exception(f"所有翻译引擎都失败了: {e}")
@@ -0,0 +1,460 @@
+import os
+import sys
+import time
+import ctypes
+import ctypes.util
+import platform
+import threading
+from collections import OrderedDict
+import numpy as np
+import cv2
+from PIL import Image, ImageGrab
+
+
+# Windows 10 2004+ 支持把窗口排除在屏幕截图之外
+WDA_NONE = 0x00
+WDA_EXCLUDEFROMCAPTURE = 0x11
+
+
+def exclude_window_from_capture(win_id):
+    """
+    让窗口不出现在任何屏幕截图中（目前只有 Windows 支持）。
+    成功返回 True，平台不支持或调用失败返回 False。
+    """
+    if platform.system() != "Windows":
+        return False
+    try:
+        hwnd = int(win_id)
+        if ctypes.windll.user32.SetWindowDisplayAffinity(hwnd, WDA_EXCLUDEFROMCAPTURE):
+            return True
+        print(f"SetWindowDisplayAffinity 失败: {ctypes.GetLastError()}")
+    except Exception as e:
+        print(f"无法将窗口排除在截图之外: {e}")
+    return False
+
+
+class CaptureBackend:
+    """截图后端基类：grab_gray 返回 (高, 宽) 的 uint8 灰度数组"""
+
+    name = "base"
+
+    def grab_gray(self, bbox, out=None):
+        """
+        截取屏幕区域 (x1, y1, x2, y2) 并转换为灰度（子类必须实现）。
+        提供 out 时结果写入该数组（形状必须匹配），否则分配新数组。
+        """
+        raise NotImplementedError
+
+    def grab_rgb(self, bbox, out=None):
+        """截取屏幕区域并返回 (高, 宽, 3) 的 RGB 数组（子类必须实现），用于需要颜色信息的预处理"""
+        raise NotImplementedError
+
+    def close(self):
+        """释放后端占用的资源"""
+        pass
+
+
+class PILCaptureBackend(CaptureBackend):
+    """PIL ImageGrab 截图 - 全平台可用，每次截图都会分配新的图像"""
+
+    name = "pil"
+
+    def grab_gray(self, bbox, out=None):
+        image = ImageGrab.grab(bbox=bbox, all_screens=True)
+        rgb = np.asarray(image.convert('RGB'))
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY, dst=out)
+
+    def grab_rgb(self, bbox, out=None):
+        image = ImageGrab.grab(bbox=bbox, all_screens=True)
+        rgb = np.asarray(image.convert('RGB'))
+        if out is None:
+            return rgb.copy()
+        out[...] = rgb
+        return out
+
+
+# --- X11 共享内存 (MIT-SHM) 截图 ---
+
+class _XImage(ctypes.Structure):
+    _fields_ = [
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('xoffset', ctypes.c_int),
+        ('format', ctypes.c_int),
+        ('data', ctypes.c_void_p),
+        ('byte_order', ctypes.c_int),
+        ('bitmap_unit', ctypes.c_int),
+        ('bitmap_bit_order', ctypes.c_int),
+        ('bitmap_pad', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('bytes_per_line', ctypes.c_int),
+        ('bits_per_pixel', ctypes.c_int),
+        ('red_mask', ctypes.c_ulong),
+        ('green_mask', ctypes.c_ulong),
+        ('blue_mask', ctypes.c_ulong),
+        ('obdata', ctypes.c_void_p),
+    ]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ('shmseg', ctypes.c_ulong),
+        ('shmid', ctypes.c_int),
+        ('shmaddr', ctypes.c_void_p),
+        ('readOnly', ctypes.c_int),
+    ]
+
+
+class _XErrorEvent(ctypes.Structure):
+    _fields_ = [
+        ('type', ctypes.c_int),
+        ('display', ctypes.c_void_p),
+        ('resourceid', ctypes.c_ulong),
+        ('serial', ctypes.c_ulong),
+        ('error_code', ctypes.c_ubyte),
+        ('request_code', ctypes.c_ubyte),
+        ('minor_code', ctypes.c_ubyte),
+    ]
+
+
+_X_ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(_XErrorEvent))
+
+
+def _on_x_error(display, event):
+    _x_error_codes[display] = event.contents.error_code
+    return 0
+
+
+# Xlib 的错误处理函数是进程全局的（Qt 的 Xlib 连接也会用到），回调对象放在模块级，永远不会被释放
+_x_error_callback = _X_ERROR_HANDLER(_on_x_error)
+_x_error_codes = {}  # Display 指针 -> 最近一次错误码
+_x_error_lock = threading.Lock()
+_x_error_users = 0
+_x_previous_handler = None
+
+
+def _install_x_error_handler(x11):
+    """第一个 XShm 后端安装错误处理函数（默认的处理会直接退出进程），并保存之前的处理函数"""
+    global _x_error_users, _x_previous_handler
+    with _x_error_lock:
+        if _x_error_users == 0:
+            _x_previous_handler = x11.XSetErrorHandler(ctypes.cast(_x_error_callback, ctypes.c_void_p))
+        _x_error_users += 1
+
+
+def _release_x_error_handler(x11):
+    """最后一个 XShm 后端关闭时恢复之前的错误处理函数"""
+    global _x_error_users, _x_previous_handler
+    with _x_error_lock:
+        _x_error_users -= 1
+        if _x_error_users == 0:
+            x11.XSetErrorHandler(_x_previous_handler)
+            _x_previous_handler = None
+
+ZPIXMAP = 2
+ALL_PLANES = 0xFFFFFFFF
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+
+class _ShmSegment:
+    """一个截图尺寸对应的共享内存段和 XImage，numpy 视图直接指向共享内存"""
+
+    def __init__(self, lib, width, height):
+        self.lib = lib
+        self.width = width
+        self.height = height
+        self.info = _XShmSegmentInfo()
+        self.info.shmid = -1
+        self.image = None
+        self.attached = False
+
+        x11, xext, libc, display = lib.x11, lib.xext, lib.libc, lib.display
+        self.image = xext.XShmCreateImage(display, lib.visual, lib.depth, ZPIXMAP, None,
+                                          ctypes.byref(self.info), width, height)
+        if not self.image:
+            raise RuntimeError("XShmCreateImage 失败")
+
+        ximage = self.image.contents
+        if ximage.bits_per_pixel != 32:
+            self.close()
+            raise RuntimeError(f"不支持的像素格式: {ximage.bits_per_pixel} bpp")
+
+        size = ximage.bytes_per_line * height
+        self.info.shmid = libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+        if self.info.shmid < 0:
+            self.close()
+            raise RuntimeError(f"shmget 失败: errno {ctypes.get_errno()}")
+
+        self.info.shmaddr = libc.shmat(self.info.shmid, None, 0)
+        if self.info.shmaddr in (None, ctypes.c_void_p(-1).value):
+            self.info.shmaddr = None
+            self.close()
+            raise RuntimeError(f"shmat 失败: errno {ctypes.get_errno()}")
+        ximage.data = self.info.shmaddr
+        self.info.readOnly = 0
+
+        if not xext.XShmAttach(display, ctypes.byref(self.info)):
+            self.close()
+            raise RuntimeError("XShmAttach 失败")
+        x11.XSync(display, 0)
+        self.attached = True
+        # 双方都已附加后立即标记删除，进程退出时共享内存会被自动回收
+        libc.shmctl(self.info.shmid, IPC_RMID, None)
+
+        # BGRA 像素的零拷贝视图
+        buffer = (ctypes.c_uint8 * size).from_address(self.info.shmaddr)
+        self.bgra = np.ndarray((height, width, 4), dtype=np.uint8, buffer=buffer,
+                               strides=(ximage.bytes_per_line, 4, 1))
+
+    def close(self):
+        x11, xext, libc, display = self.lib.x11, self.lib.xext, self.lib.libc, self.lib.display
+        self.bgra = None
+        if self.attached:
+            xext.XShmDetach(display, ctypes.byref(self.info))
+            x11.XSync(display, 0)
+            self.attached = False
+        if self.image:
+            x11.XDestroyImage(self.image)
+            self.image = None
+        if self.info.shmaddr:
+            libc.shmdt(ctypes.c_void_p(self.info.shmaddr))
+            self.info.shmaddr = None
+        if self.info.shmid >= 0:
+            libc.shmctl(self.info.shmid, IPC_RMID, None)
+            self.info.shmid = -1
+
+
+class _X11Libraries:
+    """加载 libX11 / libXext / libc 并声明用到的函数签名"""
+
+    def __init__(self):
+        x11_path = ctypes.util.find_library('X11')
+        xext_path = ctypes.util.find_library('Xext')
+        if not x11_path or not xext_path:
+            raise RuntimeError("未找到 libX11 或 libXext")
+        self.x11 = ctypes.CDLL(x11_path)
+        self.xext = ctypes.CDLL(xext_path)
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+        x11, xext, libc = self.x11, self.xext, self.libc
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XRootWindow.restype = ctypes.c_ulong
+        x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultVisual.restype = ctypes.c_void_p
+        x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDestroyImage.argtypes = [ctypes.POINTER(_XImage)]
+        x11.XSetErrorHandler.argtypes = [ctypes.c_void_p]
+        x11.XSetErrorHandler.restype = ctypes.c_void_p
+
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                         ctypes.c_char_p, ctypes.POINTER(_XShmSegmentInfo),
+                                         ctypes.c_uint, ctypes.c_uint]
+        xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XImage),
+                                      ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+        self.display = None
+        self.visual = None
+        self.depth = 0
+
+
+class XShmCaptureBackend(CaptureBackend):
+    """
+    X11 共享内存截图 - 每个截图尺寸保留一个共享内存段，X 服务器直接写入，
+    numpy 以零拷贝视图读取，再用一次 cvtColor 转为灰度。
+    """
+
+    name = "xshm"
+
+    def __init__(self, display_name=None, max_segments=4):
+        self.max_segments = max_segments
+        self._segments = OrderedDict()  # (宽, 高) -> _ShmSegment
+        self._lock = threading.Lock()  # Xlib 连接只能同时被一个线程使用
+        self._handler_installed = False
+
+        self.lib = _X11Libraries()
+        x11 = self.lib.x11
+        name = display_name or os.environ.get('DISPLAY')
+        self.lib.display = x11.XOpenDisplay(name.encode() if name else None)
+        if not self.lib.display:
+            raise RuntimeError(f"无法连接 X 服务器: {name}")
+        if not self.lib.xext.XShmQueryExtension(self.lib.display):
+            x11.XCloseDisplay(self.lib.display)
+            raise RuntimeError("X 服务器不支持 MIT-SHM 扩展")
+
+        # 默认的 X 错误处理会直接退出进程，这里改为记录错误
+        _install_x_error_handler(x11)
+        self._handler_installed = True
+
+        screen = x11.XDefaultScreen(self.lib.display)
+        self.root = x11.XRootWindow(self.lib.display, screen)
+        self.lib.visual = x11.XDefaultVisual(self.lib.display, screen)
+        self.lib.depth = x11.XDefaultDepth(self.lib.display, screen)
+        self.screen_width = x11.XDisplayWidth(self.lib.display, screen)
+        self.screen_height = x11.XDisplayHeight(self.lib.display, screen)
+
+    @staticmethod
+    def is_supported():
+        """当前会话是否可能使用 XShm（X11 会话，而不是纯 Wayland）"""
+        return (sys.platform.startswith('linux') and bool(os.environ.get('DISPLAY'))
+                and os.environ.get('XDG_SESSION_TYPE', '').lower() != 'wayland')
+
+    def _get_segment(self, width, height):
+        key = (width, height)
+        segment = self._segments.get(key)
+        if segment is None:
+            segment = _ShmSegment(self.lib, width, height)
+            self._segments[key] = segment
+            while len(self._segments) > self.max_segments:
+                _, old = self._segments.popitem(last=False)
+                old.close()
+        else:
+            self._segments.move_to_end(key)
+        return segment
+
+    def grab_bgra(self, bbox):
+        """
+        截图并返回指向共享内存的 BGRA 视图（零拷贝）。
+        视图内容在下一次相同尺寸的截图时会被覆盖，调用方必须持有 self._lock。
+        """
+        x1, y1, x2, y2 = bbox
+        width, height = x2 - x1, y2 - y1
+        if width <= 0 or height <= 0:
+            raise ValueError(f"无效的截图区域: {bbox}")
+        if x1 < 0 or y1 < 0 or x2 > self.screen_width or y2 > self.screen_height:
+            raise ValueError(f"截图区域超出屏幕范围: {bbox}")
+
+        segment = self._get_segment(width, height)
+        _x_error_codes.pop(self.lib.display, None)
+        ok = self.lib.xext.XShmGetImage(self.lib.display, self.root, segment.image, x1, y1, ALL_PLANES)
+        self.lib.x11.XSync(self.lib.display, 0)
+        error = _x_error_codes.pop(self.lib.display, None)
+        if not ok or error is not None:
+            raise RuntimeError(f"XShmGetImage 失败 (X 错误码: {error})")
+        return segment.bgra
+
+    def grab_gray(self, bbox, out=None):
+        with self._lock:
+            bgra = self.grab_bgra(bbox)
+            return cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY, dst=out)
+
+    def grab_rgb(self, bbox, out=None):
+        with self._lock:
+            bgra = self.grab_bgra(bbox)
+            return cv2.cvtColor(bgra, cv2.COLOR_BGRA2RGB, dst=out)
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
+            if self.lib.display:
+                self.lib.x11.XCloseDisplay(self.lib.display)
+                _x_error_codes.pop(self.lib.display, None)
+                self.lib.display = None
+            if self._handler_installed:
+                self._handler_installed = False
+                _release_x_error_handler(self.lib.x11)
+
+
+def create_capture_backend(prefer="auto"):
+    """创建截图后端：X11 会话优先使用 XShm，失败时回退到 PIL"""
+    if prefer in ("auto", "xshm") and XShmCaptureBackend.is_supported():
+        try:
+            backend = XShmCaptureBackend()
+            print("截图后端: XShm (共享内存)")
+            return backend
+        except Exception as e:
+            print(f"XShm 截图后端不可用: {e}，使用 PIL 截图")
+    return PILCaptureBackend()
+
+
+_default_backend = None
+_default_backend_lock = threading.Lock()
+
+
+def get_capture_backend():
+    """获取共享的截图后端"""
+    global _default_backend
+    with _default_backend_lock:
+        if _default_backend is None:
+            _default_backend = create_capture_backend()
+        return _default_backend
+
+
+def fallback_to_pil_backend():
+    """当前后端出错时切换到 PIL 截图"""
+    global _default_backend
+    with _default_backend_lock:
+        if _default_backend is not None and not isinstance(_default_backend, PILCaptureBackend):
+            _default_backend.close()
+        _default_backend = PILCaptureBackend()
+        return _default_backend
+
+
+def grab_region(bbox, color=False):
+    """截取屏幕区域 (x1, y1, x2, y2)，返回灰度 PIL 图像；color=True 时返回 RGB 图像"""
+    try:
+        backend = get_capture_backend()
+        array = backend.grab_rgb(bbox) if color else backend.grab_gray(bbox)
+    except Exception as e:
+        print(f"截图后端出错: {e}，回退到 PIL 截图")
+        backend = fallback_to_pil_backend()
+        array = backend.grab_rgb(bbox) if color else backend.grab_gray(bbox)
+    return Image.fromarray(array)
+
+
+def benchmark_capture_backends(bbox, runs=50):
+    """对比各截图后端的单帧耗时，返回 {后端名: 平均毫秒}"""
+    backends = [PILCaptureBackend()]
+    if XShmCaptureBackend.is_supported():
+        try:
+            backends.append(XShmCaptureBackend())
+        except Exception as e:
+            print(f"XShm 截图后端不可用: {e}")
+
+    results = {}
+    for backend in backends:
+        out = np.empty((bbox[3] - bbox[1], bbox[2] - bbox[0]), dtype=np.uint8)
+        try:
+            backend.grab_gray(bbox, out=out)  # 预热（创建共享内存段）
+            start = time.perf_counter()
+            for _ in range(runs):
+                backend.grab_gray(bbox, out=out)
+            results[backend.name] = (time.perf_counter() - start) * 1000 / runs
+        except Exception as e:
+            print(f"基准测试 {backend.name} 失败: {e}")
+        finally:
+            backend.close()
+    return results
+
+
+def main():
+    """命令行基准测试（可在 Xvfb 下运行）: python screen_capture.py [x1 y1 x2 y2] [次数]"""
+    bbox = tuple(int(v) for v in sys.argv[1:5]) if len(sys.argv) >= 5 else (0, 0, 800, 200)
+    runs = int(sys.argv[5]) if len(sys.argv) > 5 else 50
+    print(f"=== 截图后端基准测试 (区域: {bbox}, 次数: {runs}) ===")
+    for name, ms in benchmark_capture_backends(bbox, runs).items():
+        print(f"{name:6s} 平均 {ms:7.2f}ms/帧")
+
+
+if __name__ == "__main__":
+    main()
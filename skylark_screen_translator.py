@@ -5,6 +5,7 @@ import time
 import re
 import queue
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import pytesseract
 from PIL import ImageGrab, Image, ImageEnhance
 import numpy as np
@@ -20,6 +21,18 @@ from datetime import datetime
 from threading import Lock
 from pathlib import Path
 from online_translator import OnlineTranslator
+from ocr_engine import (
+    get_ocr_engine, get_tessdata_registry, OCRStrategySelector, OCRResultCache, IncrementalLineOCR,
+    OCRProcessPool, ScriptDetector, rotate_upright, TessdataModelTiers, TESSDATA_TIERS, benchmark_model_tiers, format_tier_benchmark
+)
+from image_processing import (
+    FrameChangeDetector, TextPresenceClassifier, TextRegionDetector, SubtitleColorKeyer, TextHeightNormalizer, create_preprocess_pipeline, format_stage_timings,
+    to_gray_array, union_box, group_line_boxes, crop_box
+)
+from screen_capture import exclude_window_from_capture, grab_region
+from text_processing import OCRTextNormalizer
+from translation_pipeline import StagedPipeline, PipelineStage
+from translation_memory import TranslationMemory, SentenceTranslator, NearDuplicateIndex
 
 
 
@@ -804,7 +817,8 @@ from PyQt5.QtWidgets import (
     QComboBox, QHBoxLayout, QVBoxLayout, QGroupBox, QSizePolicy, QMessageBox, QDialog,
     QLineEdit, QListWidget, QListWidgetItem, QTabWidget, QFileDialog,
     QDialogButtonBox, QProgressBar, QTableWidget, QTableWidgetItem, QHeaderView,
-    QAbstractItemView, QTreeWidget, QTreeWidgetItem, QRadioButton, QMenu, QDesktopWidget, QProgressDialog
+    QAbstractItemView, QTreeWidget, QTreeWidgetItem, QRadioButton, QMenu, QDesktopWidget, QProgressDialog,
+    QCheckBox
 )
 from PyQt5.QtCore import Qt, QRect, QTimer, QPoint, QEvent, QThread, pyqtSignal, QLibraryInfo, QSize, QMetaType, QObject
 from PyQt5.QtGui import (
@@ -1044,6 +1058,16 @@ class DownloadWorker(QObject):
         self.ocr_code = ocr_code
         self.download_url = download_url
         self.output_path = output_path
+        # 先写入临时文件，下载完整后再原子替换到目标路径：
+        # 目标文件可能是当前启用模型的硬链接，直接截断写入会破坏正在使用的模型
+        self.temp_path = output_path + ".part"
+
+    def discard_partial(self):
+        """删除未完成的临时文件"""
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
 
     def run(self):
         try:
@@ -1054,7 +1078,7 @@ class DownloadWorker(QObject):
             total_size = int(response.headers.get('content-length', 0))
             downloaded = 0
             
-            with open(self.output_path, 'wb') as f:
+            with open(self.temp_path, 'wb') as f:
                 for chunk in response.iter_content(chunk_size=8192):
                     if chunk:
                         f.write(chunk)
@@ -1065,10 +1089,30 @@ class DownloadWorker(QObject):
                             progress = int(downloaded * 100 / total_size)
                             self.progress.emit(progress)
             
+            if total_size > 0 and downloaded != total_size:
+                raise IOError(f"文件不完整 ({downloaded}/{total_size} 字节)")
+            os.replace(self.temp_path, self.output_path)
             self.finished.emit(True, f"下载成功: {os.path.basename(self.output_path)}", self.ocr_code)
         except Exception as e:
+            self.discard_partial()
             self.finished.emit(False, f"下载失败: {e}", self.ocr_code)
 
+class TierBenchmarkWorker(QObject):
+    """模型档位基准测试工作线程类"""
+    finished = pyqtSignal(str, str)  # ocr_code, report
+
+    def __init__(self, tiers, ocr_code):
+        super().__init__()
+        self.tiers = tiers
+        self.ocr_code = ocr_code
+
+    def run(self):
+        try:
+            results = benchmark_model_tiers(self.tiers, self.ocr_code)
+            self.finished.emit(self.ocr_code, format_tier_benchmark(self.ocr_code, results))
+        except Exception as e:
+            self.finished.emit(self.ocr_code, f"基准测试失败: {e}")
+
 class SystemDetector:
     """系统检测工具类，支持各种Linux发行版和Windows"""
     
@@ -1275,6 +1319,7 @@ class Translator:
         self.lang_map = {}  # 用于快速查找已安装的语言对象
         self.diagnostic_log = [] # 用于存储诊断日志
         self.available_languages = [] # <--- 新增：恢复此属性以兼容UI
+        self.last_error = None  # 最近一次 translate() 失败的原因，成功时为 None（失败时返回的是错误信息）
 
     def log(self, message):
         """记录日志到队列和控制台"""
@@ -1389,9 +1434,11 @@ class Translator:
         """
         智能翻译文本。优先尝试直接翻译，失败后自动尝试中转翻译。
         """
+        self.last_error = None
         if not self.ready:
             error_msg = "翻译引擎未就绪，请先调用 initialize()"
             self.log(error_msg)
+            self.last_error = error_msg
             return error_msg
         
         if not text or not text.strip():
@@ -1412,6 +1459,7 @@ class Translator:
         
         final_error_msg = f"翻译彻底失败: {from_code} -> {to_code}. 原因: {error}"
         self.log(final_error_msg)
+        self.last_error = final_error_msg
         return final_error_msg
 
 
@@ -2289,9 +2337,8 @@ class PackageInfoDialog(QDialog):
     def get_ocr_status(self, lang_code):
         """获取OCR语言包安装状态"""
         try:
-            langs = pytesseract.get_languages()
             ocr_code = OCR_LANG_MAP.get(lang_code, "")
-            if ocr_code and ocr_code in langs:
+            if ocr_code and get_tessdata_registry().is_installed(ocr_code):
                 return "已安装"
             return "未安装"
         except:
@@ -2934,13 +2981,16 @@ class OCRLanguageTab(QWidget):
         # 初始化下载线程和进度对话框
         self.download_thread = None
         self.download_worker = None
+        self.download_tier = None
         self.progress_dialog = None
+        self.benchmark_thread = None
+        self.benchmark_worker = None
     
     def setup_ui(self):
         layout = QVBoxLayout()
         
         self.lang_list = QTreeWidget()
-        self.lang_list.setHeaderLabels(["语言", "OCR代码", "状态", "大小 (MB)"])
+        self.lang_list.setHeaderLabels(["语言", "OCR代码", "状态", "大小 (MB)", "模型档位"])
         self.lang_list.setColumnWidth(0, 200)
         self.populate_lang_list()
         layout.addWidget(QLabel("OCR语言包:"))
@@ -2960,6 +3010,27 @@ class OCRLanguageTab(QWidget):
         btn_layout.addWidget(self.refresh_btn)
         
         layout.addLayout(btn_layout)
+        
+        # 模型档位：fast 推理更快，best 更准确，两者可以同时安装并随时切换
+        tier_layout = QHBoxLayout()
+        tier_layout.addWidget(QLabel("模型档位:"))
+        self.tier_combo = QComboBox()
+        self.tier_combo.addItems(TESSDATA_TIERS)
+        self.tier_combo.setCurrentText("best")
+        self.tier_combo.setToolTip("fast: 速度快、体积小；best: 准确率高、速度较慢")
+        tier_layout.addWidget(self.tier_combo)
+        
+        self.switch_tier_btn = QPushButton("切换到该档位")
+        self.switch_tier_btn.clicked.connect(self.switch_ocr_tier)
+        tier_layout.addWidget(self.switch_tier_btn)
+        
+        self.benchmark_btn = QPushButton("档位基准测试")
+        self.benchmark_btn.setToolTip("用样本文本对比已安装档位的 ms/行 和字符错误率 (CER)")
+        self.benchmark_btn.clicked.connect(self.run_tier_benchmark)
+        tier_layout.addWidget(self.benchmark_btn)
+        tier_layout.addStretch()
+        
+        layout.addLayout(tier_layout)
         self.setLayout(layout)
     
     def populate_lang_list(self):
@@ -2968,24 +3039,13 @@ class OCRLanguageTab(QWidget):
         
         # 获取自定义的tessdata目录
         tessdata_dir = self.get_tessdata_dir()
+        tiers = TessdataModelTiers(tessdata_dir)
         
         try:
-            import pytesseract
-            # 获取系统安装的语言包
-            installed_langs = pytesseract.get_languages()
-            self.main_window.status_queue.put(f"已检测到系统安装的语言包: {installed_langs}")
-            
-            # 检查自定义目录中的语言包
-            custom_langs = []
-            if os.path.exists(tessdata_dir):
-                for file in os.listdir(tessdata_dir):
-                    if file.endswith('.traineddata'):
-                        lang_code = file.replace('.traineddata', '')
-                        custom_langs.append(lang_code)
-                self.main_window.status_queue.put(f"已检测到自定义目录的语言包: {custom_langs}")
-            
-            # 合并两个列表
-            all_installed_langs = list(set(installed_langs + custom_langs))
+            # 共享登记表同时扫描系统目录和自定义目录
+            registry = get_tessdata_registry()
+            registry.add_search_dir(tessdata_dir)
+            all_installed_langs = registry.get_languages()
             self.main_window.status_queue.put(f"所有可用的语言包: {all_installed_langs}")
             
         except Exception as e:
@@ -3012,6 +3072,13 @@ class OCRLanguageTab(QWidget):
                 item.setText(2, "未安装")
                 item.setForeground(2, QColor(255, 0, 0))
             
+            # 已下载的档位，当前启用的档位标记为 *；没有档位记录的已安装语言包来自系统
+            active_tier = tiers.active_tier(ocr_code)
+            tier_labels = [f"{tier}*" if tier == active_tier else tier for tier in tiers.installed_tiers(ocr_code)]
+            if not tier_labels and ocr_code in all_installed_langs:
+                tier_labels = ["系统"]
+            item.setText(4, ", ".join(tier_labels))
+            
             item.setData(0, Qt.UserRole, ocr_code)
     
     def get_package_manager(self):
@@ -3165,8 +3232,8 @@ class OCRLanguageTab(QWidget):
             self.main_window.status_queue.put(f"更新 {pkg_manager} 包缓存时未知错误: {e}")
             return False
 
-    def install_ocr_language(self, ocr_code=None):
-        """安装指定OCR语言包到自定义目录 - 使用线程避免卡死"""
+    def install_ocr_language(self, ocr_code=None, tier=None):
+        """安装指定OCR语言包（fast 或 best 档位）到自定义目录 - 使用线程避免卡死"""
         # 如果 ocr_code 未提供，从当前选中的项获取
         if ocr_code is None:
             selected_item = self.lang_list.currentItem()
@@ -3189,12 +3256,21 @@ class OCRLanguageTab(QWidget):
         # 设置 TESSDATA_PREFIX 环境变量
         os.environ['TESSDATA_PREFIX'] = tessdata_dir
         
-        # 下载语言包文件
-        download_url = f"https://github.com/tesseract-ocr/tessdata_best/raw/main/{ocr_code}.traineddata"
-        output_path = os.path.join(tessdata_dir, f"{ocr_code}.traineddata")
+        # 下载到对应档位的目录，下载完成后再启用
+        tier = tier or self.tier_combo.currentText()
+        tiers = TessdataModelTiers(tessdata_dir)
+        try:
+            os.makedirs(tiers.tier_dir(tier), exist_ok=True)
+        except OSError as e:
+            self.main_window.status_queue.put(f"创建模型档位目录失败: {e}")
+            QMessageBox.warning(self, "错误", f"无法创建模型档位目录: {e}")
+            return
+        download_url = tiers.download_url(ocr_code, tier)
+        output_path = tiers.tier_path(ocr_code, tier)
+        self.download_tier = tier
         
         # 创建进度对话框
-        self.progress_dialog = QProgressDialog(f"正在下载 {ocr_code}.traineddata...", "取消", 0, 100, self)
+        self.progress_dialog = QProgressDialog(f"正在下载 {ocr_code}.traineddata ({tier})...", "取消", 0, 100, self)
         self.progress_dialog.setWindowTitle("下载语言包")
         self.progress_dialog.setWindowModality(Qt.WindowModal)
         self.progress_dialog.setAutoClose(True)
@@ -3223,6 +3299,8 @@ class OCRLanguageTab(QWidget):
         if hasattr(self, 'download_thread') and self.download_thread.isRunning():
             self.download_thread.terminate()
             self.download_thread.wait()
+            # 线程被强行终止，清理留下的临时文件（已有的档位文件保持不变）
+            self.download_worker.discard_partial()
             self.main_window.status_queue.put("下载已取消")
             QMessageBox.information(self, "信息", "下载已取消")
     
@@ -3236,10 +3314,19 @@ class OCRLanguageTab(QWidget):
         
         self.progress_dialog.close()
         
+        tier = self.download_tier
+        tiers = TessdataModelTiers(self.get_tessdata_dir())
         if success:
-            self.main_window.status_queue.put(message)
-            QMessageBox.information(self, "成功", f"{ocr_code} OCR语言包安装成功")
+            try:
+                tiers.activate(ocr_code, tier)
+                self.main_window.status_queue.put(message)
+                QMessageBox.information(self, "成功", f"{ocr_code} OCR语言包 ({tier}) 安装成功")
+            except Exception as e:
+                error_msg = f"启用 {ocr_code} ({tier}) 模型失败: {e}"
+                self.main_window.status_queue.put(error_msg)
+                QMessageBox.warning(self, "安装失败", error_msg)
         else:
+            # 下载写在临时文件中，失败时已有的档位文件和启用中的模型都不受影响
             error_msg = f"下载 {ocr_code}.traineddata 失败: {message}"
             self.main_window.status_queue.put(error_msg)
             QMessageBox.warning(self, "下载失败", error_msg)
@@ -3247,6 +3334,78 @@ class OCRLanguageTab(QWidget):
         # 刷新语言包列表
         self.populate_lang_list()
     
+    def switch_ocr_tier(self):
+        """把选中的语言切换到所选档位，该档位未下载时先下载"""
+        selected_item = self.lang_list.currentItem()
+        if not selected_item:
+            self.main_window.status_queue.put("请先选择一个语言包")
+            QMessageBox.warning(self, "错误", "请先从列表中选择一个语言包")
+            return
+        
+        ocr_code = selected_item.data(0, Qt.UserRole)
+        tier = self.tier_combo.currentText()
+        tiers = TessdataModelTiers(self.get_tessdata_dir())
+        
+        if tier not in tiers.installed_tiers(ocr_code):
+            reply = QMessageBox.question(
+                self, "下载模型",
+                f"{ocr_code} 的 {tier} 模型尚未下载，是否现在下载？",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if reply == QMessageBox.Yes:
+                self.install_ocr_language(ocr_code, tier)
+            return
+        
+        try:
+            tiers.activate(ocr_code, tier)
+            self.main_window.status_queue.put(f"{ocr_code} 已切换到 {tier} 模型")
+        except Exception as e:
+            error_msg = f"切换 {ocr_code} 模型档位失败: {e}"
+            self.main_window.status_queue.put(error_msg)
+            QMessageBox.warning(self, "切换失败", error_msg)
+        
+        self.populate_lang_list()
+    
+    def run_tier_benchmark(self):
+        """在后台线程中对比选中语言已下载档位的速度和字符错误率"""
+        selected_item = self.lang_list.currentItem()
+        if not selected_item:
+            self.main_window.status_queue.put("请先选择一个语言包")
+            QMessageBox.warning(self, "错误", "请先从列表中选择一个语言包")
+            return
+        
+        ocr_code = selected_item.data(0, Qt.UserRole)
+        tiers = TessdataModelTiers(self.get_tessdata_dir())
+        if not tiers.installed_tiers(ocr_code):
+            QMessageBox.information(self, "提示", f"{ocr_code} 还没有下载任何档位的模型，请先安装 fast 或 best 档位")
+            return
+        if self.benchmark_thread is not None:
+            self.main_window.status_queue.put("基准测试正在进行中，请稍候...")
+            return
+        
+        self.benchmark_btn.setEnabled(False)
+        self.main_window.status_queue.put(f"正在对 {ocr_code} 的模型档位进行基准测试...")
+        
+        self.benchmark_thread = QThread()
+        self.benchmark_worker = TierBenchmarkWorker(tiers, ocr_code)
+        self.benchmark_worker.moveToThread(self.benchmark_thread)
+        
+        self.benchmark_thread.started.connect(self.benchmark_worker.run)
+        self.benchmark_worker.finished.connect(self.on_tier_benchmark_finished)
+        self.benchmark_worker.finished.connect(self.benchmark_thread.quit)
+        self.benchmark_worker.finished.connect(self.benchmark_worker.deleteLater)
+        self.benchmark_thread.finished.connect(self.benchmark_thread.deleteLater)
+        
+        self.benchmark_thread.start()
+    
+    def on_tier_benchmark_finished(self, ocr_code, report):
+        """基准测试完成处理"""
+        self.benchmark_thread = None
+        self.benchmark_worker = None
+        self.benchmark_btn.setEnabled(True)
+        self.main_window.status_queue.put(report)
+        QMessageBox.information(self, "模型档位基准测试", report)
+    
     def _get_correct_package_name(self, ocr_code):
         """根据OCR代码获取正确的包名"""
         # 基于你的终端测试结果，我们知道正确的包名格式
@@ -3327,6 +3486,8 @@ class OCRLanguageTab(QWidget):
         try:
             # 尝试删除文件
             os.remove(lang_file)
+            TessdataModelTiers(tessdata_dir).forget(ocr_code)
+            get_tessdata_registry().invalidate()
             self.main_window.status_queue.put(f"已删除语言包: {ocr_code}.traineddata")
             QMessageBox.information(self, "成功", f"已删除语言包: {ocr_code}")
         except PermissionError:
@@ -3363,6 +3524,7 @@ class OCRLanguageTab(QWidget):
             )
             
             if result.returncode == 0:
+                get_tessdata_registry().invalidate()
                 self.main_window.status_queue.put(f"已使用管理员权限删除 {ocr_code}.traineddata")
                 QMessageBox.information(self, "成功", f"已删除语言包: {ocr_code}")
             else:
@@ -3976,14 +4138,14 @@ class SelectionOverlay(QWidget):
 
 class TranslatorOverlay(QWidget):
     """翻译框覆盖层，显示在选定区域上，支持鼠标滚轮手动滚动"""
-    def __init__(self, capture_rect, parent=None):
+    def __init__(self, capture_rect, parent=None, overlay_rect=None):
         super().__init__(parent)
         self.capture_rect = capture_rect
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
         self.setAttribute(Qt.WA_TranslucentBackground)
         
-        # 设置覆盖层位置和大小
-        self.setGeometry(capture_rect)
+        # 设置覆盖层位置和大小（可以放在截图区域之外，避免出现在截图中）
+        self.setGeometry(overlay_rect if overlay_rect is not None else capture_rect)
         
         # 初始文本
         self.text = "双击翻译 | 右键隐藏翻译框"
@@ -4330,13 +4492,10 @@ class TranslatorOverlay(QWidget):
                 
             # 增加透明度使其更可见
             self.setWindowOpacity(0.8)
-            # 强制立即重绘界面
             self.update()
-            # 确保界面更新完成
-            QApplication.processEvents()
                 
-            # 使用QTimer在主线程中执行翻译
-            QTimer.singleShot(0, self.parent().process_translation)
+            # 截图、OCR和翻译在后台流水线中进行，这里只提交请求，界面保持响应
+            self.parent().process_translation()
     
     
     def close_overlay(self):
@@ -4393,11 +4552,166 @@ class TranslatorOverlay(QWidget):
         self.prepare_text_display()
         self.update()
 
+class RegionWatcher(QObject):
+    """
+    监视模式：定时采样截图区域，用帧差分检测变化。
+    画面变化并稳定一帧后才送去OCR和翻译；画面静止时逐步放慢采样，
+    并根据每次采样的耗时限制CPU占用。
+    截图和帧差分在后台线程中进行，结果通过信号交回界面线程。
+    """
+    state_changed = pyqtSignal(bool)
+    sample_ready = pyqtSignal(object)
+
+    def __init__(self, main_window, interval_ms=500, max_interval_ms=4000, cpu_budget=0.15):
+        super().__init__(main_window)
+        self.main_window = main_window
+        self.base_interval_ms = interval_ms  # 画面活动时的采样间隔
+        self.max_interval_ms = max_interval_ms  # 画面静止时的最大采样间隔
+        self.cpu_budget = cpu_budget  # 允许占用单核时间的比例
+        self.backoff_factor = 1.5
+        self.interval_ms = interval_ms
+        self.detector = FrameChangeDetector()
+        # 采样线程与流水线OCR阶段并发运行，使用自己的文字预判器（判定时会写入最近一次的统计量）
+        self.text_presence = TextPresenceClassifier()
+        self.pending_change = False  # 检测到变化，等待画面稳定
+        self._running = False
+        
+        # 统计
+        self.frames_sampled = 0
+        self.frames_translated = 0
+        self.frames_without_text = 0
+        
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._tick)
+        # 同一时间只有一次采样在进行，定时器在采样结果返回后才重新启动
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="region-watcher")
+        self.sample_ready.connect(self._on_sample_ready)
+    
+    def is_running(self):
+        return self._running
+    
+    def set_sampling_rate(self, fps):
+        """设置画面活动时的采样频率（每秒帧数）"""
+        self.base_interval_ms = max(50, int(1000 / max(fps, 0.1)))
+        self.interval_ms = self.base_interval_ms
+    
+    def start(self):
+        self.detector.reset()
+        self.pending_change = False
+        self.interval_ms = self.base_interval_ms
+        self.frames_sampled = 0
+        self.frames_translated = 0
+        self.frames_without_text = 0
+        self._running = True
+        self.timer.start(0)
+        self.state_changed.emit(True)
+        print(f"监视模式已启动: 采样间隔 {self.base_interval_ms}ms, CPU预算 {self.cpu_budget:.0%}")
+    
+    def stop(self):
+        self._running = False
+        self.timer.stop()
+        self.state_changed.emit(False)
+        print(f"监视模式已停止: 采样 {self.frames_sampled} 帧, 翻译 {self.frames_translated} 次, "
+              f"无文字跳过 {self.frames_without_text} 次")
+    
+    def _backoff(self):
+        """画面静止时放慢采样"""
+        self.interval_ms = min(int(self.interval_ms * self.backoff_factor), self.max_interval_ms)
+    
+    def close(self):
+        """停止监视并结束采样线程"""
+        if self._running:
+            self.stop()
+        self._executor.shutdown(wait=False)
+    
+    def _tick(self):
+        if not self._running:
+            return
+        main_window = self.main_window
+        try:
+            if not main_window.capture_area:
+                self.stop()
+                return
+            
+            # 上一次翻译尚未完成，保持当前状态稍后再试
+            if main_window.translation_in_progress:
+                self._schedule(0)
+                return
+            
+            # 翻译框挡住截图区域时需要临时设为透明，只能在界面线程截图；其余情况在后台截图
+            image = None
+            if main_window.overlay_needs_hiding():
+                image = main_window.capture_screen_region()
+                if image is None:
+                    self._backoff()
+                    self._schedule(0)
+                    return
+            self._executor.submit(self._sample, image, main_window.capture_area, main_window.color_keying_enabled)
+        except Exception as e:
+            print(f"监视模式采样出错: {e}")
+            self._backoff()
+            self._schedule(0)
+    
+    def _sample(self, image, capture_area, color):
+        """后台线程：截图、帧差分和文字预判，返回 (是否翻译该帧, 图像, 耗时毫秒)"""
+        start = time.perf_counter()
+        translate = False
+        try:
+            if image is None:
+                image = grab_region(capture_area, color=color)
+            if image is None:
+                self._backoff()
+                return
+            self.frames_sampled += 1
+            
+            thumb, changed = self.detector.update(image)
+            if changed:
+                # 画面正在变化（例如字幕逐字出现），尽快再采样一次确认稳定
+                self.pending_change = True
+                self.interval_ms = self.base_interval_ms
+            elif self.pending_change:
+                self.pending_change = False
+                if self.detector.differs_from_reference(thumb):
+                    self.detector.set_reference(thumb)
+                    if not self.text_presence.has_text(image):
+                        # 画面变化了但没有文字（例如字幕消失），不必OCR
+                        self.frames_without_text += 1
+                    else:
+                        self.frames_translated += 1
+                        translate = True
+            else:
+                self._backoff()
+        except Exception as e:
+            print(f"监视模式采样出错: {e}")
+            self._backoff()
+        finally:
+            self.sample_ready.emit((translate, image, (time.perf_counter() - start) * 1000))
+    
+    def _on_sample_ready(self, sample):
+        """界面线程：提交需要翻译的帧并安排下一次采样"""
+        translate, image, cost_ms = sample
+        if not self._running:
+            return
+        if translate:
+            self.main_window.process_translation(image)
+        self._schedule(cost_ms)
+    
+    def _schedule(self, cost_ms):
+        if self._running:
+            # 按CPU预算拉长间隔：本次耗时 / 间隔 不超过 cpu_budget
+            budget_interval = cost_ms / self.cpu_budget if self.cpu_budget > 0 else 0
+            self.timer.start(int(max(self.interval_ms, budget_interval)))
+
 class ScreenTranslator(QMainWindow):
     # 定义线程安全的UI更新信号
     update_ui_signal = QtCore.pyqtSignal(str, str)
     # 新增信号用于安全更新文本编辑框
     update_text_edit_signal = QtCore.pyqtSignal(str)
+    # 后台线程更新状态栏
+    update_status_signal = QtCore.pyqtSignal(str)
+    # 流水线完成的任务交回界面线程显示
+    pipeline_result_signal = QtCore.pyqtSignal(object)
     
     def __init__(self):
         super().__init__()
@@ -4435,12 +4749,16 @@ class ScreenTranslator(QMainWindow):
             tessdata_dir.mkdir(parents=True, exist_ok=True)
             os.environ['TESSDATA_PREFIX'] = str(tessdata_dir.absolute())
         
+        # 翻译记忆与 tessdata 放在同一数据目录下，重启后仍可复用
+        translation_memory_path = tessdata_dir.parent / "translation_memory.db"
+        
         # 记录目录设置
         print(f"设置 Argos 包目录: {os.environ.get('ARGOS_PACKAGES_DIR')}")
         print(f"设置 Tesseract 数据目录: {os.environ.get('TESSDATA_PREFIX')}")
         
         self.capture_area = None
         self.translator_overlay = None
+        self.overlay_excluded_from_capture = False  # 翻译框是否已被系统排除在截图之外
         self.translation_in_progress = False
         self.translation_ready = False
         
@@ -4453,6 +4771,26 @@ class ScreenTranslator(QMainWindow):
         # 🆕 修改翻译器初始化
         self.translator = Translator(self.status_queue) if ARGOS_TRANSLATE_AVAILABLE else None
         self.online_translator = OnlineTranslator()  # 添加在线翻译器
+        self.translation_memory = TranslationMemory(str(translation_memory_path))  # 重复的原文直接返回之前的译文
+        self.sentence_translator = SentenceTranslator(self.translation_memory)  # 只翻译之前没见过的句子
+        self.near_duplicates = NearDuplicateIndex(threshold=0.9)  # 与最近的原文只差OCR噪声时复用译文
+        self.ocr_engine = get_ocr_engine()  # 常驻OCR引擎，避免每次调用都重新加载模型
+        self.ocr_strategy = OCRStrategySelector(self.ocr_engine)  # 按置信度选择并记住每个区域的PSM
+        self.ocr_cache = OCRResultCache(max_size=64)  # 像素完全相同的帧直接复用OCR结果
+        self.text_detector = TextRegionDetector()  # OCR前定位文本行，只识别文本所在区域
+        self.text_presence = TextPresenceClassifier()  # OCR前快速判断画面中是否有文字
+        self.script_detector = ScriptDetector(self.ocr_engine)  # 每个区域检测一次文字方向和文字体系
+        self.color_keyer = SubtitleColorKeyer()  # 从首次识别成功的帧学习字幕颜色
+        self.color_keying_enabled = False
+        self.text_cleaner = OCRTextNormalizer()  # 翻译前合并折行、修复断词、去除重复行
+        self.text_normalizer = TextHeightNormalizer()  # 把字高缩放到Tesseract的最佳范围
+        self.ocr_pool = OCRProcessPool()  # 多行同时变化时并行识别（按CPU核心数启动工作进程）
+        self.line_ocr = IncrementalLineOCR(self.ocr_engine, self.text_detector, self.text_normalizer,
+                                           pool=self.ocr_pool, strategy=self.ocr_strategy)  # 只识别变化的文本行
+        self.line_ocr_max_lines = 8  # 行数不超过该值时逐行增量识别，否则整块识别
+        self.last_line_result = None
+        self.ocr_deadline_ms = 1500  # 单次OCR的时间预算，超出时降级或返回部分结果
+        self.region_watcher = RegionWatcher(self)  # 监视模式
         self.use_online_translation = True  # 默认使用在线翻译
         self.translation_ready = False  # 初始化为 False，需通过 initialize_offline_translator 设置
 
@@ -4475,8 +4813,17 @@ class ScreenTranslator(QMainWindow):
         # 连接信号
         self.update_text_edit_signal.connect(self.safe_append_translation)
         self.update_ui_signal.connect(self._update_ui_slot)
+        self.update_status_signal.connect(self.update_status)
+        self.pipeline_result_signal.connect(self._apply_pipeline_result)
         # 添加线程锁
         self.translation_lock = Lock()
+        # 截图 -> OCR -> 翻译 分阶段流水线，结果交回界面线程显示；新请求总是优先，过时的任务直接丢弃
+        self.translation_pipeline = StagedPipeline([
+            PipelineStage("capture", self._stage_capture),
+            PipelineStage("ocr", self._stage_ocr),
+            PipelineStage("translate", self._stage_translate),
+        ], on_result=self.pipeline_result_signal.emit, on_error=self._on_pipeline_error, name="translation")
+        self.current_job_id = 0
         # 添加图标
         self.setWindowIcon(QIcon("skylark.png"))
 
@@ -4625,6 +4972,24 @@ class ScreenTranslator(QMainWindow):
         online_engine_layout.addWidget(self.api_settings_btn)
         
         engine_layout.addLayout(online_engine_layout)
+        
+        placement_layout = QHBoxLayout()
+        placement_layout.addWidget(QLabel("翻译框位置:"))
+        self.overlay_placement_combo = QComboBox()
+        self.overlay_placement_combo.addItem("自动 (不遮挡截图)", "auto")
+        self.overlay_placement_combo.addItem("覆盖在区域上", "over")
+        self.overlay_placement_combo.addItem("区域外侧", "outside")
+        self.overlay_placement_combo.setToolTip("系统不支持把翻译框排除在截图外时，\"自动\" 会把翻译框放在区域外侧，截图无需隐藏翻译框")
+        self.overlay_placement_combo.currentIndexChanged.connect(self.create_translator_overlay)
+        placement_layout.addWidget(self.overlay_placement_combo)
+        
+        self.color_key_checkbox = QCheckBox("字幕颜色抠图")
+        self.color_key_checkbox.setToolTip("适用于固定颜色的游戏/视频字幕：首次识别成功后学习文字颜色，\n"
+                                           "之后按颜色直接取出文字，复杂背景下比降噪更快更干净")
+        self.color_key_checkbox.toggled.connect(self.toggle_color_keying)
+        placement_layout.addWidget(self.color_key_checkbox)
+        engine_layout.addLayout(placement_layout)
+        
         engine_group.setLayout(engine_layout)
         main_layout.addWidget(engine_group)
         
@@ -4642,6 +5007,20 @@ class ScreenTranslator(QMainWindow):
         self.toggle_overlay_btn.clicked.connect(self.toggle_overlay_visibility)
         control_layout.addWidget(self.toggle_overlay_btn)
         
+        self.watch_btn = QPushButton("监视模式")
+        self.watch_btn.setCheckable(True)
+        self.watch_btn.setToolTip("定时检测翻译区域，画面变化时自动翻译")
+        self.watch_btn.toggled.connect(self.toggle_watch_mode)
+        control_layout.addWidget(self.watch_btn)
+        
+        self.watch_rate_combo = QComboBox()
+        for fps in (0.5, 1, 2, 4):
+            self.watch_rate_combo.addItem(f"{fps:g} 帧/秒", fps)
+        self.watch_rate_combo.setCurrentIndex(2)
+        self.watch_rate_combo.setToolTip("监视模式的采样频率（画面静止时会自动降低）")
+        self.watch_rate_combo.currentIndexChanged.connect(self.on_watch_rate_changed)
+        control_layout.addWidget(self.watch_rate_combo)
+        
         self.lang_pack_btn = QPushButton("语言包管理")
         self.lang_pack_btn.clicked.connect(self.manage_language_packs)
         control_layout.addWidget(self.lang_pack_btn)
@@ -4756,6 +5135,23 @@ class ScreenTranslator(QMainWindow):
                 self.update_status("Argos Translate 未安装，离线翻译不可用")
                 self.translation_ready = False
 
+    def toggle_watch_mode(self, checked):
+        """开启/关闭监视模式"""
+        if checked:
+            if not self.capture_area:
+                QMessageBox.warning(self, "警告", "请先选择翻译区域")
+                self.watch_btn.setChecked(False)
+                return
+            self.region_watcher.set_sampling_rate(self.watch_rate_combo.currentData())
+            self.region_watcher.start()
+            self.update_status("监视模式已开启，画面变化时自动翻译")
+        elif self.region_watcher.is_running():
+            self.region_watcher.stop()
+            self.update_status("监视模式已关闭")
+
+    def on_watch_rate_changed(self):
+        self.region_watcher.set_sampling_rate(self.watch_rate_combo.currentData())
+
     def on_online_engine_changed(self):
         if self.use_online_translation:
             current_engine = self.online_engine_combo.currentData()
@@ -5092,6 +5488,10 @@ class ScreenTranslator(QMainWindow):
             QApplication.processEvents()
 
     def update_status(self, text):
+        if threading.current_thread() is not threading.main_thread():
+            # 后台线程不能直接操作控件，交给界面线程
+            self.update_status_signal.emit(text)
+            return
         self.status_label.setText(text)
 
     def clear_results(self):
@@ -5122,6 +5522,8 @@ class ScreenTranslator(QMainWindow):
                     self.capture_area = (rect.x(), rect.y(), rect.x() + rect.width(), rect.y() + rect.height())
                     self.update_status(f"已选择区域: {self.capture_area}")
                     self.create_translator_overlay()
+                    if self.region_watcher.is_running():
+                        self.region_watcher.detector.reset()
             self.show()
             self.restore_window()
             QApplication.processEvents()
@@ -5142,12 +5544,60 @@ class ScreenTranslator(QMainWindow):
         if self.capture_area:
             x1, y1, x2, y2 = self.capture_area
             rect = QRect(x1, y1, x2 - x1, y2 - y1)
-            self.translator_overlay = TranslatorOverlay(rect, self)
+            placement = self.overlay_placement_combo.currentData()
+            
+            overlay_rect = rect
+            if placement == "outside":
+                overlay_rect = self.get_outside_overlay_rect(rect)
+            self.translator_overlay = TranslatorOverlay(rect, self, overlay_rect)
+            
+            # 覆盖在区域上时，优先让系统把翻译框排除在截图之外（Windows）
+            self.overlay_excluded_from_capture = False
+            if overlay_rect == rect:
+                self.overlay_excluded_from_capture = exclude_window_from_capture(self.translator_overlay.winId())
+                if not self.overlay_excluded_from_capture and placement == "auto":
+                    # 系统不支持排除窗口时，把翻译框移到区域之外，截图时无需隐藏
+                    self.translator_overlay.setGeometry(self.get_outside_overlay_rect(rect))
+            
             self.update_ui_signal.connect(self.translator_overlay.handle_update_signal)
             self.translator_overlay.show()
             self.overlay_hidden = False
 
+    def get_outside_overlay_rect(self, capture_rect):
+        """计算紧贴截图区域、但不与其重叠的翻译框位置：优先下方，其次上方、右侧、左侧"""
+        screen = QApplication.screenAt(capture_rect.center()) or QApplication.primaryScreen()
+        available = screen.availableGeometry()
+        gap = 4
+        width, height = capture_rect.width(), capture_rect.height()
+        # 翻译框高度至少容纳几行文字
+        height = max(height, 80)
+        
+        candidates = [
+            QRect(capture_rect.left(), capture_rect.bottom() + 1 + gap, width, height),
+            QRect(capture_rect.left(), capture_rect.top() - gap - height, width, height),
+            QRect(capture_rect.right() + 1 + gap, capture_rect.top(), width, height),
+            QRect(capture_rect.left() - gap - width, capture_rect.top(), width, height),
+        ]
+        for candidate in candidates:
+            if available.contains(candidate):
+                return candidate
+        
+        # 屏幕空间不足时，尽量放在下方并限制在屏幕内
+        fallback = candidates[0]
+        fallback.moveBottom(min(fallback.bottom(), available.bottom()))
+        if fallback.intersects(capture_rect):
+            print("警告: 屏幕空间不足，翻译框与截图区域重叠")
+        return fallback
+
+    def overlay_needs_hiding(self):
+        """翻译框是否会出现在截图中（需要在截图前临时隐藏）"""
+        if not self.translator_overlay or self.overlay_hidden or self.overlay_excluded_from_capture:
+            return False
+        x1, y1, x2, y2 = self.capture_area
+        return self.translator_overlay.geometry().intersects(QRect(x1, y1, x2 - x1, y2 - y1))
+
     def close_overlay(self):
+        self.watch_btn.setChecked(False)
         if self.translator_overlay:
             try:
                 self.update_ui_signal.disconnect(self.translator_overlay.handle_update_signal)
@@ -5237,46 +5687,45 @@ class ScreenTranslator(QMainWindow):
         return code
 
     def preprocess_image(self, image):
+        """使用完整预处理方案（自动二值化 + 去噪 + 闭运算 + 锐化）处理图像"""
         try:
-            if image.mode != 'L':
-                image = image.convert('L')
-            np_img = np.array(image, dtype=np.uint8)
-            mean_brightness = np.mean(np_img)
-            std_brightness = np.std(np_img)
-            
-            # 动态调整预处理策略
-            if std_brightness < 25:  # 低对比度图像
-                p_low, p_high = np.percentile(np_img, (5, 95))
-                np_img = np.clip((np_img - p_low) * 255.0 / (p_high - p_low), 0, 255).astype(np.uint8)
-                # 使用更大的 block_size 以适应更多场景
-                block_size = max(15, int(min(np_img.shape[:2]) * 0.1)) | 1
-                thresh_img = cv2.adaptiveThreshold(np_img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block_size, 5)
-            elif mean_brightness < 50 or mean_brightness > 200:  # 过暗或过亮
-                thresh_img = cv2.equalizeHist(np_img)
-                # 适度去噪，保持细节
-                thresh_img = cv2.fastNlMeansDenoising(thresh_img, None, 7, 7, 21)
-            else:  # 正常光照
-                _, thresh_img = cv2.threshold(np_img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            
-            # 调整形态学操作，增强字符连接
-            kernel = np.ones((2, 2), np.uint8)  # 恢复到 (2, 2) 以连接字符
-            thresh_img = cv2.morphologyEx(thresh_img, cv2.MORPH_CLOSE, kernel)
-            # 恢复适当的锐化，增强边缘
-            thresh_img = cv2.filter2D(thresh_img, -1, np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]]))
-            
-            del np_img  # 释放原始数组
-            return Image.fromarray(thresh_img)
+            gray, timings = create_preprocess_pipeline("best").run(image)
+            print(f"预处理耗时: {format_stage_timings(timings)}")
+            return Image.fromarray(gray)
         except Exception as e:
             print(f"高级处理失败: {e}, 使用回退方案")
             return image
 
+    def toggle_color_keying(self, enabled):
+        """开启/关闭字幕颜色抠图（开启后截图保留颜色信息）"""
+        self.color_keying_enabled = enabled
+        if not enabled:
+            self.color_keyer.forget()
+        self.update_status("字幕颜色抠图已开启，首次识别成功后学习文字颜色" if enabled else "字幕颜色抠图已关闭")
+    
+    def learn_subtitle_color(self, image, boxes, confidence, capture_area):
+        """用识别成功的文字框学习截图区域 capture_area 的字幕颜色"""
+        if (not self.color_keying_enabled or not boxes or confidence < 60
+                or self.color_keyer.has_model(capture_area)):
+            return
+        self.color_keyer.learn(image, boxes, region_key=capture_area)
+    
     def capture_screen_region(self):
-        """截图方法 - 改进版，不隐藏翻译框"""
+        """截图方法 - 翻译框不在截图范围内（或已被系统排除）时直接截图，不闪烁也不等待"""
         if not self.capture_area:
             print("错误：尚未选择截图区域。")
             self.update_status("错误：尚未选择截图区域")
             return None
         
+        if not self.overlay_needs_hiding():
+            try:
+                return grab_region(self.capture_area, color=self.color_keying_enabled)
+            except Exception as e:
+                print(f"截图失败: {e}")
+                self.update_status(f"截图失败: {e}")
+                return None
+        
+        # 回退方案：用户选择了覆盖区域且系统不支持排除窗口，截图前临时把翻译框设为透明
         try:
             # 不再隐藏翻译框，而是设置其为完全透明
             if self.translator_overlay:
@@ -5292,8 +5741,7 @@ class ScreenTranslator(QMainWindow):
             time.sleep(0.05)
             
             # 截图
-            image = ImageGrab.grab(bbox=self.capture_area, all_screens=True)
-            image = image.convert('RGB').convert('L')
+            image = grab_region(self.capture_area, color=self.color_keying_enabled)
             
             # 恢复翻译框透明度
             if self.translator_overlay:
@@ -5320,10 +5768,9 @@ class ScreenTranslator(QMainWindow):
         if not ocr_code:
             return False, f"语言 {lang_code} 没有对应的OCR语言包"
         
-        # 检查是否已安装该语言包
+        # 检查是否已安装该语言包（共享登记表，只是一次字典查找）
         try:
-            installed_langs = pytesseract.get_languages()
-            if ocr_code not in installed_langs:
+            if not get_tessdata_registry().is_installed(ocr_code):
                 return False, f"OCR语言包 {ocr_code} 未安装"
             return True, f"OCR语言包 {ocr_code} 已安装"
         except Exception as e:
@@ -5336,8 +5783,7 @@ class ScreenTranslator(QMainWindow):
             return False, f"语言 {lang_code} 没有对应的OCR语言包"
         
         try:
-            installed_langs = pytesseract.get_languages()
-            if ocr_code in installed_langs:
+            if get_tessdata_registry().is_installed(ocr_code):
                 return True, f"OCR语言包 {ocr_code} 已安装"
             
             # 语言包未安装，尝试安装
@@ -5375,6 +5821,7 @@ class ScreenTranslator(QMainWindow):
             stdout_output, stderr_output = process.communicate(input=f"{password}\n", timeout=300)
             
             if process.returncode == 0:
+                get_tessdata_registry().invalidate()
                 return True, f"成功安装 {ocr_code} OCR语言包"
             else:
                 return False, f"安装 {ocr_code} OCR语言包失败: {stderr_output}"
@@ -5382,50 +5829,171 @@ class ScreenTranslator(QMainWindow):
         except Exception as e:
             return False, f"安装OCR语言包时出错: {e}"
     
-    def ocr_image(self, image):
-        """OCR识别图像文本 - 增强版，支持语言检查和自动安装"""
+    def resolve_ocr_language(self):
+        """检查源语言的OCR语言包，缺失时尝试安装（可能弹出对话框，必须在界面线程调用）"""
+        supported, message = self.check_ocr_language_support(SOURCE_LANG)
+        
+        if not supported:
+            # 尝试安装语言包
+            installed, install_message = self.ensure_ocr_language_installed(SOURCE_LANG)
+            
+            if not installed:
+                # 安装失败，使用英语作为后备
+                self.update_status(f"{install_message}，使用英语OCR作为后备")
+                return "eng"
+            # 安装成功，使用安装的语言
+            return OCR_LANG_MAP[SOURCE_LANG]
+        # 语言已支持，直接使用
+        return OCR_LANG_MAP[SOURCE_LANG]
+
+    def ocr_image(self, image, ocr_lang=None, capture_area=None):
+        """
+        OCR识别图像文本 - 增强版，支持语言检查和自动安装。
+        在后台线程调用时需传入 ocr_lang 和截图时的 capture_area（用作文字体系、策略、颜色和缩放缓存的区域键），
+        不能读取界面线程随时可能修改的 self.capture_area。
+        """
         if image is None:
             return ""
         
         try:
-            # 检查语言支持
-            supported, message = self.check_ocr_language_support(SOURCE_LANG)
-            
-            if not supported:
-                # 尝试安装语言包
-                installed, install_message = self.ensure_ocr_language_installed(SOURCE_LANG)
-                
-                if not installed:
-                    # 安装失败，使用英语作为后备
-                    self.update_status(f"{install_message}，使用英语OCR作为后备")
-                    ocr_lang = "eng"
-                else:
-                    # 安装成功，使用安装的语言
-                    ocr_lang = OCR_LANG_MAP[SOURCE_LANG]
-            else:
-                # 语言已支持，直接使用
-                ocr_lang = OCR_LANG_MAP[SOURCE_LANG]
+            if ocr_lang is None:
+                ocr_lang = self.resolve_ocr_language()
+            if capture_area is None:
+                capture_area = self.capture_area
             
             print(f"OCR 使用语言: {ocr_lang}")
             
-            # 尝试不同的PSM配置
-            config_options = [
-                '--psm 6 --oem 3',  # 单行文本
-                '--psm 11 --oem 3'  # 稀疏文本
-            ]
-            
-            best_text = ""
-            max_confidence = 0
-            
-            for config in config_options:
-                text = pytesseract.image_to_string(image, lang=ocr_lang, config=config)
-                # 估计置信度 (简单方法: 字符数)
-                confidence = len(text.strip())
-                if confidence > max_confidence:
-                    max_confidence = confidence
-                    best_text = text.strip()
-            
-            print(f"OCR 识别结果: {best_text}")
+            # 画面与之前某一帧像素完全相同时直接返回缓存的结果
+            frame_hash = self.ocr_cache.compute_hash(image)
+            cached_text = self.ocr_cache.get(frame_hash, ocr_lang)
+            if cached_text is not None:
+                stats = self.ocr_cache.stats()
+                print(f"OCR 缓存命中 (命中 {stats['hits']} / 未命中 {stats['misses']}): {cached_text}")
+                return cached_text
+            
+            # 每个区域只检测一次文字体系和方向：所选语言与画面文字不符时自动换用对应的语言包
+            cache_lang = ocr_lang
+            gray = to_gray_array(image)
+            script_info = self.script_detector.detect(gray, region_key=capture_area)
+            detected_lang = self.script_detector.choose_language(script_info, ocr_lang)
+            if detected_lang != ocr_lang:
+                print(f"检测到文字体系 {script_info.script}，OCR 改用语言: {detected_lang}")
+                ocr_lang = detected_lang
+            if script_info.rotate:
+                gray = rotate_upright(gray, script_info.rotate)
+            
+            # 已学到字幕颜色时按颜色取出文字（白底黑字），用单独的区域键记住这种图像的策略
+            ocr_region_key = capture_area
+            keyed = None
+            if self.color_keying_enabled and not script_info.rotate:
+                keyed = self.color_keyer.apply(image, region_key=capture_area)
+                if keyed is not None:
+                    gray = keyed
+                    ocr_region_key = (capture_area, "color_key")
+            
+            # 先定位文本行：没有文本时不调用Tesseract，有文本时只识别文本所在的紧凑区域
+            text_lines = self.text_detector.detect(gray)
+            full_frame = False
+            if not text_lines:
+                if not self.text_presence.has_text(gray):
+                    print("未检测到文本区域，跳过OCR")
+                    self.ocr_cache.put(frame_hash, cache_lang, "")
+                    return ""
+                # 行定位失败但画面有文字特征（对比度很低等）：整幅画面交给整块识别，不直接返回空结果
+                print(f"未定位到文本行，但画面可能有文字，识别整幅画面 ({self.text_presence.describe()})")
+                text_lines = [(0, 0, gray.shape[1], gray.shape[0])]
+                full_frame = True
+            deadline_ms = self.ocr_deadline_ms
+            line_result = None
+            if not full_frame and len(text_lines) <= self.line_ocr_max_lines:
+                # 行数较少（字幕、聊天框）：逐行识别，没有变化的行直接复用之前的结果
+                line_result = self.line_ocr.recognize(
+                    gray, lang=ocr_lang, region_key=ocr_region_key, boxes=text_lines,
+                    deadline_ms=self.ocr_deadline_ms)
+                self.last_line_result = line_result
+                best_text = line_result.text.strip()
+                if line_result.budget_hit:
+                    # 部分行没有识别，不写入整帧缓存，下一帧会补齐
+                    print(f"OCR 超出 {self.ocr_deadline_ms}ms 预算 (累计 {self.line_ocr.budget_hits}/{self.line_ocr.deadline_calls} 次)，返回部分结果")
+                    return best_text
+                if line_result.confidence >= self.ocr_strategy.confidence_threshold:
+                    print(f"OCR 识别结果 (逐行, 置信度 {line_result.confidence:.1f}): {best_text}")
+                    if keyed is None and not script_info.rotate:
+                        self.learn_subtitle_color(image, [line.box for line in line_result.lines if line.text],
+                                                  line_result.confidence, capture_area)
+                    self.ocr_cache.put(frame_hash, cache_lang, best_text)
+                    return best_text
+                # 逐行置信度不足：用剩余预算改走整块识别（按置信度选择预处理方案和PSM）
+                deadline_ms = self.ocr_deadline_ms - line_result.elapsed_ms
+                if deadline_ms <= 0:
+                    print(f"逐行识别置信度 {line_result.confidence:.1f} 偏低，但时间预算已用完，返回逐行结果")
+                    return best_text
+                print(f"逐行识别置信度 {line_result.confidence:.1f} 低于 {self.ocr_strategy.confidence_threshold:.0f}，"
+                      f"改用整块识别 (剩余预算 {deadline_ms:.0f}ms)")
+            else:
+                self.last_line_result = None
+            
+            text_box = union_box(text_lines)
+            print(f"检测到 {len(text_lines)} 行文本，识别区域 {text_box} (原图 {gray.shape[1]}x{gray.shape[0]})")
+            text_gray, scale = self.text_normalizer.normalize(crop_box(gray, text_box), region_key=ocr_region_key)
+            if scale != 1.0:
+                print(f"文字高度归一化: 缩放 {scale:.2f} -> {text_gray.shape[1]}x{text_gray.shape[0]}")
+            text_image = Image.fromarray(text_gray)
+            
+            result = None
+            if line_result is None:
+                # 行数较多：把文本行分组，用该区域记住的策略交给进程池并行识别（策略未知或进程池未就绪时跳过）
+                height, width = text_gray.shape[:2]
+                scaled_lines = []
+                for x, y, w, h in text_lines:
+                    x1, y1 = int((x - text_box[0]) * scale), int((y - text_box[1]) * scale)
+                    x2 = min(width, int(round((x + w - text_box[0]) * scale)))
+                    y2 = min(height, int(round((y + h - text_box[1]) * scale)))
+                    scaled_lines.append((x1, y1, x2 - x1, y2 - y1))
+                blocks = group_line_boxes(scaled_lines, self.ocr_pool.max_workers)
+                result = self.ocr_strategy.recognize_boxes(text_image, blocks, lang=ocr_lang,
+                                                           region_key=ocr_region_key, pool=self.ocr_pool,
+                                                           deadline_ms=deadline_ms)
+                if result is not None:
+                    print(f"并行识别 {len(blocks)} 个区域 (置信度 {result.confidence:.1f}, {result.elapsed_ms:.0f}ms)")
+                    remaining_ms = deadline_ms - result.elapsed_ms if deadline_ms else None
+                    if (result.confidence < self.ocr_strategy.confidence_threshold and not result.budget_hit
+                            and (remaining_ms is None or remaining_ms > 0)):
+                        # 记住的策略不再适用：用剩余预算重新选择策略
+                        deadline_ms = remaining_ms
+                        result = None
+            
+            if result is None:
+                # 按逐词置信度选择PSM配置，同一区域之后只需运行记住的配置
+                result = self.ocr_strategy.recognize(text_image, lang=ocr_lang, region_key=ocr_region_key,
+                                                     deadline_ms=deadline_ms)
+            best_text = result.text.strip()
+            if line_result is not None and line_result.confidence > result.confidence:
+                # 整块识别也没有更好，保留逐行结果
+                best_text = line_result.text.strip()
+                print(f"整块识别置信度 {result.confidence:.1f} 不如逐行结果，保留逐行结果: {best_text}")
+                if not result.budget_hit:
+                    self.ocr_cache.put(frame_hash, cache_lang, best_text)
+                return best_text
+            if result.budget_hit or result.degraded:
+                stats = self.ocr_strategy.budget_report()
+                print(f"OCR 时间预算 {self.ocr_deadline_ms}ms: {'已耗尽，返回部分结果' if result.budget_hit else '不足，已降级策略'} "
+                      f"(预算耗尽 {stats['budget_hits']} 次 / 降级 {stats['degraded']} 次 / 共 {stats['deadline_calls']} 次)")
+            
+            print(f"OCR 识别结果 (预处理 {result.profile}, {result.config}, 置信度 {result.confidence:.1f}, {result.elapsed_ms:.0f}ms): {best_text}")
+            print(f"预处理耗时: {format_stage_timings(result.stage_timings)}")
+            if keyed is None and not script_info.rotate and result.data:
+                # image_to_data 的词框在缩放后的裁剪图坐标系中，换算回原图
+                data = result.data
+                word_boxes = [
+                    (text_box[0] + int(data['left'][i] / scale), text_box[1] + int(data['top'][i] / scale),
+                     int(data['width'][i] / scale) + 1, int(data['height'][i] / scale) + 1)
+                    for i, word in enumerate(data['text'])
+                    if word and word.strip() and data['conf'][i] >= 60
+                ]
+                self.learn_subtitle_color(image, word_boxes, result.confidence, capture_area)
+            if not result.budget_hit:
+                self.ocr_cache.put(frame_hash, cache_lang, best_text)
             return best_text if best_text else ""
         
         except Exception as e:
@@ -5433,102 +6001,186 @@ class ScreenTranslator(QMainWindow):
             self.update_status(f"OCR 识别失败: {e}")
             return ""
 
-    def process_translation(self):
-        if self.translation_in_progress:
-            self.update_status("翻译已在进行中，请稍候...")
+    def process_translation(self, image=None):
+        """
+        提交一次翻译请求到 截图 -> OCR -> 翻译 流水线，立即返回。
+        翻译进行中再次触发时，新请求优先，旧请求在下一个阶段边界被丢弃。
+        """
+        if not self.capture_area and image is None:
+            self.update_status("错误：尚未选择截图区域")
             return
         
-        self.translation_lock.acquire()
-        self.translation_in_progress = True
-        background_thread_started = False
-        
         try:
             self.update_ui_signal.emit("正在处理翻译...", "正在处理...")
             print("开始处理翻译...")
             
-            image = self.capture_screen_region()
-            if not image:
-                self.update_ui_signal.emit("截图失败，请重新选择区域", "截图失败")
-                return
+            # 翻译框挡住截图区域时需要临时设为透明，只能在界面线程截图
+            if image is None and self.overlay_needs_hiding():
+                image = self.capture_screen_region()
+                if not image:
+                    self.update_ui_signal.emit("截图失败，请重新选择区域", "截图失败")
+                    return
+            
+            # 可能弹出安装语言包的对话框，在界面线程完成
+            ocr_lang = self.resolve_ocr_language()
+            
+            self.translation_in_progress = True
+            job = self.translation_pipeline.submit({
+                'image': image,  # 监视模式会传入已经采样好的帧
+                'capture_area': self.capture_area,
+                'color': self.color_keying_enabled,
+                'ocr_lang': ocr_lang,
+                'source_lang': SOURCE_LANG,
+                'target_lang': TARGET_LANG,
+                'online': self.use_online_translation,
+                'engine_name': self.online_engine_combo.currentText(),
+            })
+            self.current_job_id = job.job_id
         
-            original_text = self.ocr_image(image)
-            if not original_text:
-                self.update_ui_signal.emit("OCR 未识别到文本，请检查图像质量", "OCR 未识别到文本")
-                return
+        except Exception as e:
+            import traceback
+            error_msg = f"翻译过程中出错: {e}"
+            print(f"{error_msg}\n{traceback.format_exc()}")
+            self.append_translation(error_msg)
+            self.update_ui_signal.emit(error_msg, f"错误: {e}")
+            self.translation_in_progress = False
+
+    def _stage_capture(self, job):
+        """流水线截图阶段（后台线程）"""
+        payload = job.payload
+        if payload['image'] is None:
+            try:
+                payload['image'] = grab_region(payload['capture_area'], color=payload['color'])
+            except Exception as e:
+                print(f"截图失败: {e}")
+                payload['image'] = None
+        if not payload['image']:
+            return job.finish("截图失败，请重新选择区域", "截图失败")
+        return True
+
+    def _stage_ocr(self, job):
+        """流水线OCR阶段（后台线程）"""
+        payload = job.payload
+        image = payload.pop('image')
+        
+        # 空白、纯色或没有文字特征的画面不送去OCR
+        if not self.text_presence.has_text(image):
+            print(f"未检测到文字，跳过OCR ({self.text_presence.describe()})")
+            return job.finish("截图区域中未检测到文字", "未检测到文字")
+        
+        original_text = self.ocr_image(image, ocr_lang=payload['ocr_lang'], capture_area=payload['capture_area'])
+        if not original_text:
+            return job.finish("OCR 未识别到文本，请检查图像质量", "OCR 未识别到文本")
+        
+        # 把折行连接成句子，减少翻译引擎看到的分段数和字符数（在线翻译按字符计费）
+        raw_length = len(original_text)
+        original_text = self.text_cleaner.normalize(original_text)
+        stats = self.text_cleaner.stats()
+        print(f"文本整理: {raw_length} -> {len(original_text)} 字符 "
+              f"(累计节省 {stats['chars_saved']} 字符, {stats['segments_saved']} 个分段)")
+        
+        if len(original_text) < 5 or not any(c.isalnum() for c in original_text):
+            return job.finish("OCR 结果可能为乱码，请检查图像质量", "OCR 结果可能为乱码",
+                              f"原文 (可能无效): {original_text}")
+        
+        payload['text'] = original_text
+        job.log_lines.append(f"原文: {original_text}")
+        return True
+
+    def _stage_translate(self, job):
+        """流水线翻译阶段（后台线程）：逐句复用翻译记忆，只把新句子交给翻译引擎"""
+        payload = job.payload
+        original_text = payload['text']
+        source_lang, target_lang = payload['source_lang'], payload['target_lang']
+        # 翻译记忆按实际给出译文的引擎区分：查找时用即将使用的引擎（当前引擎不支持该语言对时会自动切换），
+        # 写入时用翻译函数报告的引擎（失败时可能改用备用引擎）
+        if payload['online']:
+            engine = self.online_translator.resolve_translator(source_lang, target_lang)
+        else:
+            engine = "argos"
+        
+        # 与最近翻译过的原文只差OCR噪声（多出的 |、l/I 混淆、少一个字符）时直接复用那次的译文
+        duplicate = self.near_duplicates.find(original_text, source_lang, target_lang, engine)
+        if duplicate is not None:
+            translated_text, similarity = duplicate
+            stats = self.near_duplicates.stats()
+            print(f"近似重复文本 (相似度 {similarity:.2f} >= {self.near_duplicates.threshold:.2f})，复用译文 "
+                  f"(累计复用 {stats['reused']}/{stats['lookups']} 次, 其中近似 {stats['fuzzy']} 次)")
+            engine_label = payload['engine_name'] if payload['online'] else "Argos"
+            return job.finish("翻译完成 (复用相同文本的译文)", translated_text,
+                              f"翻译 ({engine_label}, 复用): {translated_text}")
+        
+        if payload['online']:
+            engine_label = payload['engine_name']
+            network_checked = []
+            
+            def translate_func(text):
+                # 所有句子都命中翻译记忆时不需要网络
+                if not network_checked:
+                    if not self.check_network():
+                        raise ConnectionError("无网络连接")
+                    network_checked.append(True)
+                    self.update_ui_signal.emit("正在在线翻译文本...", "正在在线翻译...")
+                return self.online_translator.translate_with_engine(text, source_lang, target_lang)
         
-            if len(original_text) < 5 or not any(c.isalnum() for c in original_text):
-                self.update_ui_signal.emit("OCR 结果可能为乱码，请检查图像质量", "OCR 结果可能为乱码")
-                self.append_translation(f"原文 (可能无效): {original_text}")
-                return
-            
-            self.append_translation(f"原文: {original_text}")
-    
-            if self.use_online_translation:
-                self.update_ui_signal.emit("正在在线翻译文本...", "正在在线翻译...")
-                def online_translate_and_update():
-                    try:
-                        if not self.check_network():
-                            self.update_ui_signal.emit("无网络连接，无法在线翻译", "无网络")
-                            return
-                        translated_text = self.online_translator.translate(original_text, SOURCE_LANG, TARGET_LANG)
-                        engine_name = self.online_engine_combo.currentText()
-                        self.append_translation(f"翻译 ({engine_name}): {translated_text}")
-                        self.update_ui_signal.emit("在线翻译完成", translated_text)
-                    except Exception as e:
-                        import traceback
-                        error_msg = f"在线翻译错误: {e}"
-                        print(f"{error_msg}\n{traceback.format_exc()}")
-                        self.update_ui_signal.emit(error_msg, f"翻译失败: {e}")
-                    finally:
-                        self.translation_in_progress = False
-                        self.translation_lock.release()
-                threading.Thread(target=online_translate_and_update, daemon=True).start()
-                background_thread_started = True
-    
-            elif self.translator and not self.translation_ready:
+        else:
+            if self.translator and not self.translation_ready:
                 self.update_status("离线翻译未就绪，正在初始化...")
                 self.initialize_offline_translator()
                 if not self.translation_ready:
-                    self.update_ui_signal.emit("离线翻译初始化失败，请检查语言包", "初始化失败")
-                    return
-    
-            elif self.translator and self.translation_ready:
+                    return job.finish("离线翻译初始化失败，请检查语言包", "初始化失败")
+            if not (self.translator and self.translation_ready):
+                return job.finish("仅显示OCR结果 (无翻译引擎)", original_text, f"仅OCR: {original_text}")
+            engine_label = "Argos"
+            
+            def translate_func(text):
                 self.update_ui_signal.emit("正在离线翻译文本...", "正在离线翻译...")
-                def offline_translate_and_update():
-                    try:
-                        translated_text = self.translator.translate(original_text, SOURCE_LANG, TARGET_LANG)
-                        self.append_translation(f"翻译 (Argos): {translated_text}")
-                        self.update_ui_signal.emit("离线翻译完成", translated_text)
-                    except Exception as e:
-                        import traceback
-                        error_msg = f"离线翻译错误: {e}"
-                        print(f"{error_msg}\n{traceback.format_exc()}")
-                        self.update_ui_signal.emit(error_msg, f"错误: {e}")
-                    finally:
-                        self.translation_in_progress = False
-                        self.translation_lock.release()
-                threading.Thread(target=offline_translate_and_update, daemon=True).start()
-                background_thread_started = True
-    
-            else:
-                self.update_ui_signal.emit("仅显示OCR结果 (无翻译引擎)", original_text)
-                self.append_translation(f"仅OCR: {original_text}")
-                self.translation_in_progress = False
-                self.translation_lock.release()
-    
+                with self.translation_lock:
+                    result = self.translator.translate(text, source_lang, target_lang)
+                    if self.translator.last_error:
+                        # Argos 把失败原因作为译文返回，不能写入翻译记忆
+                        raise RuntimeError(self.translator.last_error)
+                return result, "argos"
+        
+        try:
+            translated_text, novel, used_engine = self.sentence_translator.translate(
+                original_text, source_lang, target_lang, engine, translate_func)
+        except ConnectionError:
+            return job.finish("无网络连接，无法在线翻译", "无网络")
         except Exception as e:
             import traceback
-            error_msg = f"翻译过程中出错: {e}"
+            kind = "在线" if payload['online'] else "离线"
+            error_msg = f"{kind}翻译错误: {e}"
             print(f"{error_msg}\n{traceback.format_exc()}")
-            self.append_translation(error_msg)
-            self.update_ui_signal.emit(error_msg, f"错误: {e}")
-            self.translation_in_progress = False
-            self.translation_lock.release()
-    
-        finally:
-            if not background_thread_started and self.translation_lock.locked():
-                self.translation_in_progress = False
-                self.translation_lock.release()
+            return job.finish(error_msg, f"翻译失败: {e}" if payload['online'] else f"错误: {e}")
+        
+        if used_engine is not None:
+            self.near_duplicates.add(original_text, source_lang, target_lang, used_engine, translated_text)
+        if payload['online'] and used_engine != engine:
+            engine_label = f"{engine_label} -> {used_engine or '多个引擎'}"
+        stats = self.sentence_translator.stats()
+        print(f"逐句翻译: 新句子 {novel} 个 (累计复用 {stats['reused']} / 翻译 {stats['translated']} 句, "
+              f"复用率 {stats['reuse_rate']:.0%}, 引擎调用 {stats['calls']} 次)")
+        if not novel:
+            return job.finish("翻译完成 (翻译记忆)", translated_text, f"翻译 ({engine_label}, 记忆): {translated_text}")
+        kind = "在线" if payload['online'] else "离线"
+        return job.finish(f"{kind}翻译完成", translated_text, f"翻译 ({engine_label}): {translated_text}")
+
+    def _on_pipeline_error(self, job, error):
+        """流水线阶段抛出未处理的异常（后台线程）"""
+        job.finish(f"翻译过程中出错: {error}", f"错误: {error}", f"翻译过程中出错: {error}")
+        self.pipeline_result_signal.emit(job)
+
+    def _apply_pipeline_result(self, job):
+        """流水线渲染阶段（界面线程）：显示最新任务的结果，过时的结果直接丢弃"""
+        if job.job_id != self.current_job_id:
+            return
+        for line in job.log_lines:
+            self.append_translation(line)
+        self.update_ui_signal.emit(job.status_text, job.overlay_text)
+        timings = ", ".join(f"{name} {ms:.0f}ms" for name, ms in job.stage_timings)
+        print(f"翻译流水线完成 #{job.job_id}: {timings} (总计 {job.elapsed_ms():.0f}ms)")
+        self.translation_in_progress = False
 
     def check_network(self):
         try:
@@ -5544,6 +6196,8 @@ class ScreenTranslator(QMainWindow):
             self.translator_overlay.update()
 
     def closeEvent(self, event):
+        self.region_watcher.close()
+        
         if self.global_mouse_listener:
             try:
                 self.global_mouse_listener.stop()
@@ -5559,6 +6213,15 @@ class ScreenTranslator(QMainWindow):
             self.translator_overlay.close()
             self.translator_overlay.deleteLater()
             self.translator_overlay = None
+        
+        self.translation_pipeline.close()
+        self.translation_memory.close()
+        if self.ocr_strategy:
+            self.ocr_strategy.close()
+        if self.ocr_pool:
+            self.ocr_pool.close()
+        if self.ocr_engine:
+            self.ocr_engine.close()
         event.accept()
 
     def toggle_translation_mode(self, use_online):
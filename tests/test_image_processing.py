@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+import pytest
+
+from image_processing import TextPresenceClassifier, TextRegionDetector
+
+
+def _frame(height, width, background, foreground=None):
+    image = np.full((height, width), background, np.uint8)
+    if foreground is not None:
+        cv2.putText(image, "Hello world, traveller", (20, height // 2),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, foreground, 2)
+    return image
+
+
+@pytest.mark.parametrize("size", [(200, 800), (400, 1200), (1080, 1920)])
+@pytest.mark.parametrize("background, foreground", [(255, 0), (120, 150), (120, 170), (30, 220)])
+def test_text_presence_detects_text(size, background, foreground):
+    assert TextPresenceClassifier().has_text(_frame(*size, background, foreground))
+
+
+@pytest.mark.parametrize("size", [(200, 800), (1080, 1920)])
+@pytest.mark.parametrize("background", [0, 120, 255])
+def test_text_presence_rejects_uniform_frames(size, background):
+    assert not TextPresenceClassifier().has_text(_frame(*size, background))
+
+
+def test_text_presence_rejects_low_noise_and_stripes():
+    rng = np.random.default_rng(0)
+    noisy = (120 + rng.integers(-2, 3, (400, 1200))).astype(np.uint8)
+    stripes = np.zeros((400, 1200), np.uint8)
+    stripes[:, ::8] = 255
+    classifier = TextPresenceClassifier()
+    assert not classifier.has_text(noisy)
+    assert not classifier.has_text(stripes)
+
+
+def test_text_presence_handles_tiny_and_color_frames():
+    classifier = TextPresenceClassifier()
+    assert not classifier.has_text(np.zeros((3, 3), np.uint8))
+    color = cv2.cvtColor(_frame(200, 800, 255, 0), cv2.COLOR_GRAY2BGR)
+    assert classifier.has_text(color)
+
+
+@pytest.mark.parametrize("background, foreground", [(255, 0), (120, 150), (120, 170)])
+def test_region_detector_finds_low_contrast_lines(background, foreground):
+    lines = TextRegionDetector().detect(_frame(200, 800, background, foreground))
+    assert len(lines) == 1
+    x, y, w, h = lines[0]
+    assert y < 100 < y + h and w > 200
+
+
+def test_region_detector_ignores_noise_and_blank_frames():
+    rng = np.random.default_rng(0)
+    detector = TextRegionDetector()
+    assert detector.detect(_frame(200, 800, 120)) == []
+    assert detector.detect((120 + rng.integers(-6, 7, (200, 800))).astype(np.uint8)) == []
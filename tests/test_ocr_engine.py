@@ -0,0 +1,69 @@
+import threading
+
+import numpy as np
+from PIL import Image
+
+from ocr_engine import OCRResultCache, OCRStrategySelector
+
+
+class _Engine:
+    """返回固定逐词结果的假 OCR 引擎，记录调用次数"""
+
+    def __init__(self, words=(), conf=90):
+        self.words = list(words)
+        self.conf = conf
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def image_to_data(self, image, lang="eng", config="", timeout=0):
+        with self._lock:
+            self.calls += 1
+        count = len(self.words)
+        return {'text': list(self.words), 'conf': [self.conf] * count, 'block_num': [1] * count,
+                'par_num': [1] * count, 'line_num': [1] * count, 'word_num': list(range(1, count + 1))}
+
+
+def _image():
+    gray = np.full((40, 200), 255, np.uint8)
+    gray[15:25, 20:180:6] = 0
+    return Image.fromarray(gray)
+
+
+def test_strategy_stops_after_cheapest_profile_without_words():
+    engine = _Engine()
+    selector = OCRStrategySelector(engine=engine)
+    result = selector.recognize(_image(), region_key="area")
+    assert result.text == ""
+    assert engine.calls == len(selector.configs)
+    assert selector.remembered_profile("area", "eng") == "none"
+
+
+def test_strategy_remembers_first_confident_result():
+    engine = _Engine(["Hello", "world"])
+    selector = OCRStrategySelector(engine=engine)
+    assert selector.recognize(_image(), region_key="area").text == "Hello world"
+    assert engine.calls == 1
+    assert selector.recognize(_image(), region_key="area").text == "Hello world"
+    assert engine.calls == 2
+
+
+def test_strategy_miss_tries_only_neighbouring_profiles():
+    engine = _Engine(["Hello"], conf=40)
+    selector = OCRStrategySelector(engine=engine)
+    selector.remember(("area", "eng"), "balanced", selector.configs[0])
+    result = selector.recognize(_image(), region_key="area")
+    assert result.text == "Hello"
+    # 记住的策略 1 次 + 相邻的 best 和 fast 各跑全部配置，不再搜索全部 4 x 2 组合
+    assert engine.calls == 1 + 2 * len(selector.configs)
+
+
+def test_result_cache_reuses_only_identical_frames():
+    cache = OCRResultCache(max_size=2)
+    frame = np.asarray(_image())
+    cache.put(cache.compute_hash(frame), "eng", "Hello 3")
+    assert cache.get(cache.compute_hash(frame.copy()), "eng") == "Hello 3"
+    changed = frame.copy()
+    changed[0, 0] ^= 1
+    assert cache.get(cache.compute_hash(changed), "eng") is None
+    assert cache.get(cache.compute_hash(frame), "chi_sim") is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
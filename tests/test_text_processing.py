@@ -0,0 +1,74 @@
+from text_processing import (bounded_edit_distance, digit_runs, fold_ocr_noise, join_sentences,
+                             normalize_ocr_text, split_sentences)
+
+
+def test_bounded_edit_distance_within_limit():
+    assert bounded_edit_distance("kitten", "sitting", 3) == 3
+    assert bounded_edit_distance("same", "same", 0) == 0
+    assert bounded_edit_distance("", "abc", 3) == 3
+
+
+def test_bounded_edit_distance_stops_above_limit():
+    assert bounded_edit_distance("kitten", "sitting", 2) == 3
+    assert bounded_edit_distance("short", "a much longer text", 4) == 5
+
+
+def test_bounded_edit_distance_indel_only():
+    # 替换按删除 + 插入计算
+    assert bounded_edit_distance("fail", "fall", 3, substitution_cost=2) == 2
+    assert bounded_edit_distance("traveler", "traveller", 3, substitution_cost=2) == 1
+
+
+def test_fold_ocr_noise_keeps_i_and_l_apart():
+    assert fold_ocr_noise("The attack will fail now") != fold_ocr_noise("The attack will fall now")
+    assert fold_ocr_noise("mail") != fold_ocr_noise("mall")
+
+
+def test_fold_ocr_noise_ignores_confusables_and_noise_glyphs():
+    assert fold_ocr_noise("Hello, world.") == fold_ocr_noise("HeIlo world")
+    assert fold_ocr_noise("| Hello world |") == fold_ocr_noise("Hello world")
+    assert fold_ocr_noise("G0 home") == fold_ocr_noise("GO home")
+
+
+def test_digit_runs_fold_confusables_inside_words():
+    assert digit_runs("He1lo world, traveller") == ()
+    assert digit_runs("c0de") == ()
+    assert digit_runs("3 potions") == ("3",)
+    assert digit_runs("Level10") == ("10",)
+
+
+def test_normalize_drops_only_consecutive_duplicate_lines():
+    assert normalize_ocr_text("Hello\nhello\nworld.") == "Hello world."
+    assert normalize_ocr_text("OK\nWhere are you?\nOK\nFine.") == "OK Where are you?\nOK Fine."
+    assert normalize_ocr_text("Yes.\n\nYes.") == "Yes.\nYes."
+
+
+def test_normalize_repairs_hyphen_breaks():
+    assert normalize_ocr_text("The transla-\ntion is done.") == "The translation is done."
+    assert normalize_ocr_text("a compu-\nter") == "a computer"
+    assert normalize_ocr_text("hyphen\u00ad\nated") == "hyphenated"
+
+
+def test_normalize_keeps_compound_hyphens():
+    assert normalize_ocr_text("a well-\nknown fact.") == "a well-known fact."
+    assert normalize_ocr_text("cloud-\nbased tools") == "cloud-based tools"
+    assert normalize_ocr_text("the Anglo-\nSaxon era") == "the Anglo-Saxon era"
+
+
+def test_normalize_joins_wrapped_lines_and_keeps_sentences():
+    assert normalize_ocr_text("This is a\nwrapped line.\nNext one.") == "This is a wrapped line.\nNext one."
+    assert normalize_ocr_text("\u4f60\u597d\n\u4e16\u754c") == "\u4f60\u597d\u4e16\u754c"
+    assert normalize_ocr_text("") == ""
+
+
+def test_split_sentences_respects_abbreviations_and_decimals():
+    assert split_sentences("Mr. Smith paid 3.14 dollars. Then he left!\n\nBye.") == [
+        ["Mr. Smith paid 3.14 dollars.", "Then he left!"], ["Bye."]]
+    assert split_sentences('"Really?" he said.') == [['"Really?" he said.']]
+    assert split_sentences("\u4f60\u597d\u3002\u518d\u89c1\u3002") == [["\u4f60\u597d\u3002", "\u518d\u89c1\u3002"]]
+
+
+def test_join_sentences_round_trip():
+    text = "First one. Second one?\nThird line."
+    assert join_sentences(split_sentences(text)) == text
+    assert join_sentences([["\u4f60\u597d\u3002", "\u518d\u89c1\u3002"], ["Hi.", ""]]) == "\u4f60\u597d\u3002\u518d\u89c1\u3002\nHi."
@@ -0,0 +1,169 @@
+import time
+
+from translation_memory import NearDuplicateIndex, SentenceTranslator, TranslationMemory
+
+
+def _index(text="Hello world, traveller", translation="你好，旅行者"):
+    index = NearDuplicateIndex()
+    index.add(text, "en", "zh", "argos", translation)
+    return index
+
+
+def test_near_duplicate_exact_match():
+    assert _index().find("Hello world, traveller", "en", "zh", "argos") == ("你好，旅行者", 1.0)
+
+
+def test_near_duplicate_tolerates_confusables_in_words():
+    assert _index().find("He1lo world, traveller", "en", "zh", "argos") == ("你好，旅行者", 1.0)
+    assert _index().find("HeIlo world traveller.", "en", "zh", "argos") == ("你好，旅行者", 1.0)
+
+
+def test_near_duplicate_tolerates_one_dropped_character():
+    match = _index().find("Hello world, traveler", "en", "zh", "argos")
+    assert match is not None and match[0] == "你好，旅行者" and match[1] < 1.0
+
+
+def test_near_duplicate_rejects_real_word_changes():
+    for stored, lookup in [("The attack will fail now", "The attack will fall now"),
+                           ("Check your mail today", "Check your mall today"),
+                           ("Grab the cat by its tail", "Grab the cat by its tall")]:
+        assert _index(stored, "译文").find(lookup, "en", "zh", "argos") is None
+
+
+def test_near_duplicate_rejects_digit_changes():
+    index = _index("You found 3 potions", "你找到了 3 瓶药水")
+    assert index.find("You found 5 potions", "en", "zh", "argos") is None
+    assert index.find("You found 30 potions", "en", "zh", "argos") is None
+
+
+def test_near_duplicate_is_per_language_and_engine():
+    index = _index()
+    assert index.find("Hello world, traveller", "en", "ja", "argos") is None
+    assert index.find("Hello world, traveller", "en", "zh", "google") is None
+
+
+def test_near_duplicate_stats():
+    index = _index()
+    index.find("Hello world, traveller", "en", "zh", "argos")
+    index.find("Hello world, traveler", "en", "zh", "argos")
+    index.find("Something else entirely", "en", "zh", "argos")
+    stats = index.stats()
+    assert (stats['lookups'], stats['reused'], stats['exact'], stats['fuzzy']) == (3, 2, 1, 1)
+
+
+class _Engine:
+    """按编号逐行返回 "<原文>!" 的假翻译引擎，mangle 可以改写合并请求的返回"""
+
+    def __init__(self, mangle=None, name="argos"):
+        self.requests = []
+        self.mangle = mangle
+        self.name = name
+
+    def __call__(self, text):
+        self.requests.append(text)
+        translated = "\n".join(line + "!" for line in text.splitlines())
+        if self.mangle and "\n" in text:
+            return self.mangle(translated), self.name
+        return translated, self.name
+
+
+def test_sentence_translator_batches_numbered_sentences():
+    memory = TranslationMemory()
+    engine = _Engine()
+    text, novel, used = SentenceTranslator(memory).translate("Good morning. How are you?", "en", "zh", "argos", engine)
+    assert novel == 2 and used == "argos" and len(engine.requests) == 1
+    assert engine.requests[0] == "[1] Good morning.\n[2] How are you?"
+    assert text == "Good morning.! How are you?!"
+    assert memory.get("How are you?", "en", "zh", "argos") == "How are you?!"
+
+
+def test_sentence_translator_reuses_memory():
+    memory = TranslationMemory()
+    memory.put("Good morning.", "en", "zh", "argos", "Morning!")
+    engine = _Engine()
+    text, novel, _ = SentenceTranslator(memory).translate("Good morning. See you.", "en", "zh", "argos", engine)
+    assert novel == 1 and engine.requests == ["See you."]
+    assert text == "Morning! See you.!"
+
+
+def test_sentence_translator_falls_back_when_numbering_is_lost():
+    memory = TranslationMemory()
+    engine = _Engine(mangle=lambda result: result.replace("[1] ", "").replace("[2] ", ""))
+    translator = SentenceTranslator(memory)
+    text, _, _ = translator.translate("First sentence here. Second sentence here.", "en", "zh", "argos", engine)
+    assert len(engine.requests) == 3
+    assert text == "First sentence here.! Second sentence here.!"
+    assert translator.stats()['batch_mismatches'] == 1
+
+
+def test_sentence_translator_falls_back_when_sentences_shift():
+    # 引擎把第二句的内容并进了第一句，编号数量仍然正确
+    def shift(result):
+        first, second, third = result.splitlines()
+        return "\n".join([first + " " + second[4:], "[2] Ok.", third])
+
+    memory = TranslationMemory()
+    engine = _Engine(mangle=shift)
+    sentences = "Please open the door now. Then walk into the hall. Look around the room."
+    text, _, _ = SentenceTranslator(memory).translate(sentences, "en", "zh", "argos", engine)
+    assert len(engine.requests) == 4
+    assert memory.get("Then walk into the hall.", "en", "zh", "argos") == "Then walk into the hall.!"
+    assert "Ok." not in text
+
+
+def test_sentence_translator_keys_memory_on_the_engine_that_answered():
+    memory = TranslationMemory()
+    engine = _Engine(name="mymemory")
+    text, novel, used = SentenceTranslator(memory).translate("Hello there.", "en", "zh", "google", engine)
+    assert used == "mymemory"
+    assert memory.get("Hello there.", "en", "zh", "google") is None
+    assert memory.get("Hello there.", "en", "zh", "mymemory") == "Hello there.!"
+
+
+def test_translation_memory_lru_evicts_oldest():
+    memory = TranslationMemory(max_memory=2)
+    memory.put("one", "en", "zh", "argos", "1")
+    memory.put("two", "en", "zh", "argos", "2")
+    assert memory.get("one", "en", "zh", "argos") == "1"
+    memory.put("three", "en", "zh", "argos", "3")
+    assert memory.get("two", "en", "zh", "argos") is None
+    assert memory.get("one", "en", "zh", "argos") == "1"
+    assert memory.get("three", "en", "zh", "argos") == "3"
+
+
+def test_translation_memory_normalizes_keys_and_skips_empty():
+    memory = TranslationMemory()
+    memory.put("  Hello   world ", "en", "zh", "argos", "你好")
+    memory.put("Empty", "en", "zh", "argos", "")
+    assert memory.get("Hello world", "en", "zh", "argos") == "你好"
+    assert memory.get("Empty", "en", "zh", "argos") is None
+
+
+def test_translation_memory_ttl_expires_entries(tmp_path, monkeypatch):
+    memory = TranslationMemory(db_path=str(tmp_path / "memory.db"), ttl_seconds=60)
+    memory.put("Hello", "en", "zh", "argos", "你好")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    assert memory.get("Hello", "en", "zh", "argos") is None
+    assert memory.prune() == 1
+    assert memory.disk_entries() == 0
+    memory.close()
+
+
+def test_translation_memory_persists_and_prunes_least_recently_used(tmp_path, monkeypatch):
+    path = str(tmp_path / "memory.db")
+    clock = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    memory = TranslationMemory(db_path=path, max_entries=2, ttl_seconds=0)
+    for text in ("one", "two", "three"):
+        clock[0] += 1
+        memory.put(text, "en", "zh", "argos", text.upper())
+    memory.close()
+
+    clock[0] += 1
+    reopened = TranslationMemory(db_path=path, max_entries=2, ttl_seconds=0)
+    assert reopened.disk_entries() == 2
+    assert reopened.get("one", "en", "zh", "argos") is None
+    assert reopened.get("three", "en", "zh", "argos") == "THREE"
+    assert reopened.stats()['disk_hits'] == 1
+    reopened.close()
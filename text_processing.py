@@ -0,0 +1,223 @@
+import re
+import threading
+
+
+# 汉字、日文假名和全角标点：折行处直接连接，不插入空格（韩文按词分隔，仍使用空格）
+_NO_SPACE_SCRIPT = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+# 行尾是句末标点（可带右引号/右括号）时，下一行是新的句子
+_SENTENCE_END = re.compile(r'[.!?\u3002\uff01\uff1f\u2026\u203c\u2047]["\'\u201d\u2019\u300d\u300f)\uff09\]]*$')
+# 行尾连字符断词：字母 + 连字符
+_HYPHEN_BREAK = re.compile(r'(\w)[-\u2010\u00ad]$')
+# 连字符后的下一行开头只是常见后缀（可带一两个字母，如 transla-tion、compu-ter）时才是拆开的单词，
+# 否则是复合词（well-known、cloud-based），连接时保留连字符
+_WORD_SUFFIX = re.compile(
+    r'[a-z]{0,2}(?:tion|sion|ment|ness|ing|ed|er|est|ly|able|ible|ity|ities|ous|ive|al|ance|ence|'
+    r'ful|less|ize|ise|ist|ism|ure|age|ant|ent|ary|ory|ic|ical|y|es|s)s?(?![^\W\d_])')
+_WHITESPACE = re.compile(r'[ \t\u00a0\u3000]+')
+# 句子边界：西文句末标点后须跟行尾或空白加非小写字母（避免拆开 3.14、"Really?" he said 之类），
+# 全角句末标点后直接断开
+_SENTENCE_BREAK = re.compile(
+    r'(?:[.!?\u2026\u203c\u2047]+["\'\u201d\u2019\u300d\u300f)\uff09\]]*(?=\s*$|\s+(?![a-z]))'
+    r'|[\u3002\uff01\uff1f]+["\'\u201d\u2019\u300d\u300f)\uff09\]]*)\s*')
+# 句点结尾的常见缩写（Mr. Dr. St. U.S.），不是句子边界
+_ABBREVIATION = re.compile(r'^(?:[A-Z][a-z]{0,2}|(?:[A-Za-z]\.)+[A-Za-z])\.$')
+
+
+def _join_key(line):
+    """判断重复行时使用的键：忽略大小写和空白"""
+    return _WHITESPACE.sub('', line).lower()
+
+
+def normalize_ocr_text(text):
+    """
+    翻译前整理 OCR 文本：
+    - 合并连续空白；
+    - 去掉与上一行重复的行（描边/阴影常被识别成连续的两行），不相邻的重复行是正文，保留；
+    - 修复行尾连字符断词（'transla-' + 'tion' -> 'translation'），复合词保留连字符（'well-' + 'known' -> 'well-known'）；
+    - 把折行连接成完整的句子，句末标点和空行处保留分段。
+    返回整理后的文本，每行一个句子/段落。
+    """
+    if not text:
+        return ""
+
+    segments = []
+    current = ""
+    previous_key = None
+    for raw_line in text.splitlines():
+        line = _WHITESPACE.sub(' ', raw_line).strip()
+        if not line:
+            # 空行是段落分隔
+            previous_key = None
+            if current:
+                segments.append(current)
+                current = ""
+            continue
+
+        key = _join_key(line)
+        if key == previous_key:
+            continue
+        previous_key = key
+
+        if not current:
+            current = line
+            continue
+
+        hyphen = _HYPHEN_BREAK.search(current)
+        if hyphen and line[0].isalnum():
+            if current[-1] == '\u00ad' or _WORD_SUFFIX.match(line):
+                current = current[:-1] + line
+            else:
+                current += line
+        elif _SENTENCE_END.search(current):
+            segments.append(current)
+            current = line
+        elif _NO_SPACE_SCRIPT.match(current[-1]) or _NO_SPACE_SCRIPT.match(line[0]):
+            current += line
+        else:
+            current += " " + line
+
+    if current:
+        segments.append(current)
+    return "\n".join(segments)
+
+
+def split_sentences(text):
+    """
+    按行、再按句末标点切分文本，返回 [[句子, ...], ...]（每行一个列表）。
+    用于逐句查找翻译缓存，结果可用 join_sentences 按原来的顺序和分行拼回。
+    """
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        sentences = []
+        start = 0
+        for match in _SENTENCE_BREAK.finditer(line):
+            sentence = line[start:match.end()].strip()
+            if sentence and _ABBREVIATION.match(sentence.split()[-1]):
+                continue
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+        rest = line[start:].strip()
+        if rest:
+            sentences.append(rest)
+        lines.append(sentences)
+    return lines
+
+
+def join_sentences(lines):
+    """把 split_sentences 结构的（译文）句子拼回文本：行之间换行，句子之间按文字体系决定是否加空格"""
+    joined_lines = []
+    for sentences in lines:
+        current = ""
+        for sentence in sentences:
+            if not sentence:
+                continue
+            if current and not (_NO_SPACE_SCRIPT.match(current[-1]) or _NO_SPACE_SCRIPT.match(sentence[0])):
+                current += " "
+            current += sentence
+        joined_lines.append(current)
+    return "\n".join(joined_lines)
+
+
+def count_segments(text):
+    """按非空行计算分段数（在线引擎和 Argos 都按行/句切分请求）"""
+    return sum(1 for line in text.splitlines() if line.strip())
+
+
+class OCRTextNormalizer:
+    """OCR 与翻译之间的文本整理阶段，累计统计节省的字符数和分段数（在线翻译按字符计费）"""
+
+    def __init__(self):
+        self.calls = 0
+        self.chars_in = 0
+        self.chars_out = 0
+        self.segments_in = 0
+        self.segments_out = 0
+        self._lock = threading.Lock()
+
+    def normalize(self, text):
+        """整理文本并更新统计"""
+        normalized = normalize_ocr_text(text)
+        with self._lock:
+            self.calls += 1
+            self.chars_in += len(text)
+            self.chars_out += len(normalized)
+            self.segments_in += count_segments(text)
+            self.segments_out += count_segments(normalized)
+        return normalized
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'chars_in': self.chars_in,
+                'chars_out': self.chars_out,
+                'chars_saved': self.chars_in - self.chars_out,
+                'segments_in': self.segments_in,
+                'segments_out': self.segments_out,
+                'segments_saved': self.segments_in - self.segments_out,
+            }
+
+
+# OCR 常见的形近字符，比较时视为同一个字符（i 和 l 不在其中：fail/fall、mail/mall 是不同的词）
+_OCR_CONFUSABLES = str.maketrans({'|': 'l', 'I': 'l', '1': 'l', '0': 'o', 'O': 'o'})
+# 夹在字母中间的 1 0 |（He1lo、c0de、He|lo）是识别错的字母，不是数字
+_IN_WORD_CONFUSABLES = re.compile(r'(?<=[^\W\d_])[01|]+(?=[^\W\d_])')
+# OCR 常多出或漏掉的小符号，比较时忽略；单独成词的竖线通常是字幕框边缘
+_OCR_NOISE_GLYPHS = re.compile(r"[.,'`\u2018\u2019]|(?<!\S)\|+(?!\S)")
+_DIGIT_RUN = re.compile(r'\d+')
+
+
+def fold_ocr_noise(text):
+    """
+    比较用的规范文本：去掉空白和常见噪声符号（. , ' 和孤立的 |），统一大小写和形近字符（| l I 1、0 O）。
+    两段文本规范化后相同，说明它们之间只差 OCR 噪声。
+    """
+    text = _OCR_NOISE_GLYPHS.sub('', text.replace('\n', ' '))
+    return _WHITESPACE.sub('', text).translate(_OCR_CONFUSABLES).lower()
+
+
+def digit_runs(text):
+    """
+    文本中的数字串（数量、时间、编号等），数字不同是真实的内容变化。
+    夹在字母中间的形近字符（He1lo 中的 1）先还原为字母，不算数字。
+    """
+    text = _IN_WORD_CONFUSABLES.sub(lambda m: m.group().translate(_OCR_CONFUSABLES), text)
+    return tuple(_DIGIT_RUN.findall(text))
+
+
+def bounded_edit_distance(a, b, limit, substitution_cost=1):
+    """
+    带上限的编辑距离：只计算对角线附近宽度为 limit 的带状区域，超过 limit 时提前返回 limit + 1。
+    相似度判断只关心距离是否在阈值以内，比完整的 Levenshtein 快得多。
+    substitution_cost=2 时替换等于一次删除加一次插入，结果为只含插入/删除的距离。
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) > len(b):
+        a, b = b, a
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        low = max(1, i - limit)
+        high = min(len(b), i + limit)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= limit else over
+        row_min = current[0]
+        char = a[i - 1]
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (substitution_cost if char != b[j - 1] else 0)
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost if cost <= limit else over
+            if current[j] < row_min:
+                row_min = current[j]
+        if row_min > limit:
+            return over
+        previous = current
+    return previous[len(b)]
@@ -0,0 +1,423 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from text_processing import (
+    split_sentences, join_sentences, fold_ocr_noise, digit_runs, bounded_edit_distance
+)
+
+
+_WHITESPACE = re.compile(r'\s+')
+# 合并翻译时每句前加的编号 "[1] "；引擎可能把括号换成全角或在括号内加空格
+_BATCH_MARKER = re.compile(r'^\s*[\[\uff3b\u3010(\uff08]\s*(\d+)\s*[\]\uff3d\u3011)\uff09]\s*(.*)$')
+
+
+def normalize_memory_key(text):
+    """翻译记忆的键：Unicode NFKC 规范化并合并空白（全角/半角、多余空格不影响命中）"""
+    if not text:
+        return ""
+    text = unicodedata.normalize('NFKC', text)
+    return "\n".join(_WHITESPACE.sub(' ', line).strip() for line in text.splitlines() if line.strip())
+
+
+class TranslationMemory:
+    """
+    翻译记忆：内存 LRU + 磁盘 SQLite 两级缓存。
+    键为 (源语言, 目标语言, 引擎, 规范化后的原文)，重复出现的台词、菜单和字幕直接返回之前的译文，
+    重启后仍然有效。条目超过 ttl_seconds 未更新即失效；磁盘条目超过 max_entries 时按最近使用时间淘汰。
+    """
+
+    def __init__(self, db_path=None, max_memory=512, max_entries=20000, ttl_seconds=30 * 24 * 3600):
+        self.db_path = db_path  # None 表示只使用内存缓存
+        self.max_memory = max_memory
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds  # 0 表示永不过期
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._entries = OrderedDict()  # 键 -> (译文, 写入时间)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._puts_since_prune = 0
+        if db_path:
+            self._open()
+
+    def _open(self):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            # 流水线翻译线程和界面线程都会访问，连接由 self._lock 串行化
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                " source TEXT NOT NULL, target TEXT NOT NULL, engine TEXT NOT NULL, text TEXT NOT NULL,"
+                " translation TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL,"
+                " hits INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (source, target, engine, text))")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used)")
+            self._conn.commit()
+            self._prune_locked()
+        except sqlite3.Error as e:
+            print(f"打开翻译记忆数据库失败，仅使用内存缓存: {e}")
+            self._conn = None
+
+    def _expired(self, created, now):
+        return self.ttl_seconds > 0 and now - created > self.ttl_seconds
+
+    def _remember(self, key, translation, created):
+        self._entries[key] = (translation, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_memory:
+            self._entries.popitem(last=False)
+
+    def get(self, text, source, target, engine):
+        """查找译文，未命中时返回 None"""
+        normalized = normalize_memory_key(text)
+        if not normalized:
+            return None
+        key = (source, target, engine, normalized)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._entries[key]
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT translation, created FROM translations"
+                        " WHERE source=? AND target=? AND engine=? AND text=?", key).fetchone()
+                    if row is not None and not self._expired(row[1], now):
+                        self._conn.execute(
+                            "UPDATE translations SET last_used=?, hits=hits+1"
+                            " WHERE source=? AND target=? AND engine=? AND text=?", (now,) + key)
+                        self._conn.commit()
+                        self._remember(key, row[0], row[1])
+                        self.disk_hits += 1
+                        return row[0]
+                except sqlite3.Error as e:
+                    print(f"读取翻译记忆失败: {e}")
+
+            self.misses += 1
+            return None
+
+    def put(self, text, source, target, engine, translation):
+        """保存译文（空译文不保存）"""
+        normalized = normalize_memory_key(text)
+        if not normalized or not translation:
+            return
+        key = (source, target, engine, normalized)
+        now = time.time()
+        with self._lock:
+            self._remember(key, translation, now)
+            self.stores += 1
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO translations"
+                    " (source, target, engine, text, translation, created, last_used, hits)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, 0)", key + (translation, now, now))
+                self._conn.commit()
+                self._puts_since_prune += 1
+                if self._puts_since_prune >= 256:
+                    self._prune_locked()
+            except sqlite3.Error as e:
+                print(f"写入翻译记忆失败: {e}")
+
+    def _prune_locked(self):
+        """删除过期条目，并按最近使用时间把磁盘条目数限制在 max_entries 以内"""
+        self._puts_since_prune = 0
+        if self._conn is None:
+            return 0
+        removed = 0
+        if self.ttl_seconds > 0:
+            removed += self._conn.execute(
+                "DELETE FROM translations WHERE created < ?", (time.time() - self.ttl_seconds,)).rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        if count > self.max_entries:
+            removed += self._conn.execute(
+                "DELETE FROM translations WHERE rowid IN"
+                " (SELECT rowid FROM translations ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,)).rowcount
+        self._conn.commit()
+        return removed
+
+    def prune(self):
+        with self._lock:
+            try:
+                return self._prune_locked()
+            except sqlite3.Error as e:
+                print(f"清理翻译记忆失败: {e}")
+                return 0
+
+    def clear(self):
+        """清空内存和磁盘中的全部译文"""
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                try:
+                    self._conn.execute("DELETE FROM translations")
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    print(f"清空翻译记忆失败: {e}")
+
+    def disk_entries(self):
+        with self._lock:
+            if self._conn is None:
+                return 0
+            try:
+                return self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            except sqlite3.Error:
+                return 0
+
+    def stats(self):
+        """返回命中统计：内存/磁盘命中、未命中、命中率和条目数"""
+        disk_entries = self.disk_entries()
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self._entries),
+                'disk_entries': disk_entries,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.commit()
+                    self._conn.close()
+                except sqlite3.Error:
+                    pass
+                self._conn = None
+
+
+class SentenceTranslator:
+    """
+    逐句复用翻译记忆：把文本切成句子，已翻译过的句子直接取缓存，
+    只把新句子合并成一次请求（每行一句）交给翻译引擎，再按原来的顺序拼回。
+    相邻两次截图大部分句子相同时，翻译开销只与新增的内容成正比。
+    合并请求中每句带编号 "[n] "，返回的编号必须依次对应、每句的长度比例与整批相差不超过 max_length_ratio 倍，
+    否则（引擎合并/拆分了句子）改为逐句翻译；只有校验通过的译文才写入翻译记忆。
+    """
+
+    def __init__(self, memory, separator="\n", max_length_ratio=3.0, min_ratio_length=8):
+        self.memory = memory
+        self.separator = separator  # 合并请求时句子之间的分隔符（在线引擎和 Argos 都按行保留）
+        self.max_length_ratio = max_length_ratio
+        self.min_ratio_length = min_ratio_length  # 短于此长度的句子不参与长度比例校验
+        self.sentences = 0
+        self.reused = 0
+        self.translated = 0
+        self.calls = 0
+        self.batch_mismatches = 0
+        self._lock = threading.Lock()
+
+    def translate(self, text, source, target, engine, translate_func):
+        """
+        翻译 text。engine 是预计使用的引擎，用于查找翻译记忆。
+        translate_func(文本) 执行实际翻译并返回 (译文, 实际给出译文的引擎)，失败时应抛出异常（异常直接向上抛出，不写入缓存）；
+        新译文按实际引擎写入翻译记忆（在线翻译可能自动切换或改用备用引擎）。
+        返回 (译文, 新翻译的句子数, 引擎)：引擎为给出全部新译文的那个引擎，没有新句子时为 engine，
+        新句子来自不同引擎时为 None。
+        """
+        lines = split_sentences(text)
+        unique = []
+        seen = set()
+        for sentences in lines:
+            for sentence in sentences:
+                if sentence not in seen:
+                    seen.add(sentence)
+                    unique.append(sentence)
+        if not unique:
+            return "", 0, engine
+
+        known = {}
+        novel = []
+        for sentence in unique:
+            cached = self.memory.get(sentence, source, target, engine)
+            if cached is not None:
+                known[sentence] = cached
+            else:
+                novel.append(sentence)
+
+        calls = 0
+        mismatched = False
+        if novel:
+            results = None
+            engines = []
+            if len(novel) > 1:
+                # 新句子编号后合并成一次请求；编号或长度对不上时退回逐句翻译
+                calls += 1
+                batch, batch_engine = translate_func(self.separator.join(
+                    f"[{number}] {sentence}" for number, sentence in enumerate(novel, 1)))
+                results, problem = self._split_batch(batch, novel)
+                if results is None:
+                    mismatched = True
+                    print(f"合并翻译结果{problem}，改为逐句翻译 {len(novel)} 个句子")
+                else:
+                    engines = [batch_engine] * len(novel)
+            if results is None:
+                results = []
+                for sentence in novel:
+                    calls += 1
+                    translation, used_engine = translate_func(sentence)
+                    results.append(translation.strip())
+                    engines.append(used_engine)
+            for sentence, translation, used_engine in zip(novel, results, engines):
+                known[sentence] = translation
+                if translation:
+                    self.memory.put(sentence, source, target, used_engine, translation)
+            used = set(engines)
+            engine = used.pop() if len(used) == 1 else None
+
+        with self._lock:
+            self.sentences += sum(len(sentences) for sentences in lines)
+            self.reused += len(unique) - len(novel)
+            self.translated += len(novel)
+            self.calls += calls
+            self.batch_mismatches += mismatched
+        translated_lines = [[known[sentence] for sentence in sentences] for sentences in lines]
+        return join_sentences(translated_lines), len(novel), engine
+
+    def _split_batch(self, batch, sentences):
+        """按编号拆开合并翻译的结果，返回 (译文列表, None)；校验失败时返回 (None, 原因)"""
+        results = []
+        for line in batch.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            match = _BATCH_MARKER.match(line)
+            if match is None:
+                if not results:
+                    return None, "缺少编号"
+                # 引擎把一句译文拆成了多行
+                results[-1] += " " + line
+                continue
+            if int(match.group(1)) != len(results) + 1:
+                return None, f"编号 {match.group(1)} 不连续"
+            results.append(match.group(2).strip())
+        if len(results) != len(sentences):
+            return None, f"有 {len(results)} 句，与 {len(sentences)} 个句子不符"
+        if not all(results):
+            return None, "有空的译文"
+
+        # 各句的长度比例与整批相差太多，说明引擎把相邻句子的内容挪到了别的编号下
+        overall = sum(map(len, results)) / max(1, sum(map(len, sentences)))
+        for sentence, translation in zip(sentences, results):
+            if len(sentence) < self.min_ratio_length:
+                continue
+            ratio = len(translation) / len(sentence) / overall
+            if not 1 / self.max_length_ratio <= ratio <= self.max_length_ratio:
+                return None, f"长度比例异常 ({sentence!r} -> {translation!r})"
+        return results, None
+
+    def stats(self):
+        with self._lock:
+            unique = self.reused + self.translated
+            return {
+                'sentences': self.sentences,
+                'reused': self.reused,
+                'translated': self.translated,
+                'calls': self.calls,
+                'batch_mismatches': self.batch_mismatches,
+                'reuse_rate': self.reused / unique if unique else 0.0,
+            }
+
+
+class NearDuplicateIndex:
+    """
+    近似重复检测：记住最近翻译过的原文，新文本与其中某条只差 OCR 噪声时直接复用那次的译文。
+    算作噪声的差异：形近字符互换（| l I 1、0 O）、噪声符号（. , ' 孤立的 |）的多出/漏掉，
+    以及少量整字符的漏识别/多识别（traveler 和 traveller，最多 max_edits 处插入或删除）。
+    字符替换（fail 和 fall）和数字的变化（"3 potions" 和 "5 potions"）是真实的内容变化。
+    匹配条件：数字串完全相同，规范文本之间的插入/删除不超过 max_edits 处，且相似度不低于 threshold。
+    """
+
+    def __init__(self, threshold=0.9, max_recent=32, max_edits=1):
+        self.threshold = threshold  # 相似度阈值 = 1 - 编辑数 / 较长规范文本的长度
+        self.max_recent = max_recent
+        self.max_edits = max_edits
+        self.lookups = 0
+        self.reused = 0
+        self.exact = 0
+        self._recent = OrderedDict()  # (源语言, 目标语言, 引擎, 规范文本, 数字串) -> 译文
+        self._lock = threading.Lock()
+
+    def find(self, text, source, target, engine):
+        """查找只差 OCR 噪声的原文，返回 (译文, 相似度)，没有时返回 None"""
+        folded = fold_ocr_noise(text)
+        if not folded:
+            return None
+        digits = digit_runs(text)
+        key = (source, target, engine, folded, digits)
+        with self._lock:
+            self.lookups += 1
+            translation = self._recent.get(key)
+            if translation is not None:
+                best = (key, translation, 1.0)
+            else:
+                best = None
+                best_similarity = self.threshold
+                for entry_key, entry_translation in self._recent.items():
+                    if entry_key[:3] != key[:3] or entry_key[4] != digits:
+                        continue
+                    entry_folded = entry_key[3]
+                    longest = max(len(folded), len(entry_folded))
+                    limit = min(self.max_edits, int((1 - best_similarity) * longest))
+                    # 替换按两次编辑计算，只有插入/删除能落在上限以内
+                    distance = bounded_edit_distance(folded, entry_folded, limit, substitution_cost=2)
+                    if distance > limit:
+                        continue
+                    similarity = 1 - distance / longest
+                    if best is None or similarity > best[2]:
+                        best = (entry_key, entry_translation, similarity)
+                        best_similarity = similarity
+            if best is None:
+                return None
+            self._recent.move_to_end(best[0])
+            self.reused += 1
+            self.exact += best[2] == 1.0
+            return best[1], best[2]
+
+    def add(self, text, source, target, engine, translation):
+        """记录一次翻译结果"""
+        folded = fold_ocr_noise(text)
+        if not folded or not translation:
+            return
+        key = (source, target, engine, folded, digit_runs(text))
+        with self._lock:
+            self._recent[key] = translation
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.max_recent:
+                self._recent.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'lookups': self.lookups,
+                'reused': self.reused,
+                'exact': self.exact,
+                'fuzzy': self.reused - self.exact,
+                'reuse_rate': self.reused / self.lookups if self.lookups else 0.0,
+                'threshold': self.threshold,
+            }
@@ -0,0 +1,175 @@
+import time
+import queue
+import threading
+
+
+class PipelineJob:
+    """流水线中的一次翻译请求"""
+
+    def __init__(self, job_id, payload):
+        self.job_id = job_id
+        self.payload = payload  # 各阶段读写的数据（截图、OCR 文本、译文等）
+        self.created = time.perf_counter()
+        self.stage_timings = []  # [(阶段名, 毫秒), ...]
+        self.status_text = ""  # 最终显示在状态栏的文字
+        self.overlay_text = ""  # 最终显示在翻译框的文字
+        self.log_lines = []  # 追加到翻译记录的内容
+        self.error = None
+
+    def finish(self, status_text, overlay_text, *log_lines):
+        """提前结束（或完成）任务并设置要显示的结果，阶段函数返回该值即可"""
+        self.status_text = status_text
+        self.overlay_text = overlay_text
+        self.log_lines.extend(log_lines)
+        return False
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.created) * 1000
+
+
+class PipelineStage:
+    """
+    流水线的一个阶段：一个专用工作线程 + 一个有界输入队列。
+    func(job) 返回 True 表示交给下一阶段，返回 False 表示任务到此结束（结果已写入 job）。
+    """
+
+    def __init__(self, name, func, maxsize=1):
+        self.name = name
+        self.func = func
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.thread = None
+        self.processed = 0
+        self.total_ms = 0.0
+
+
+class StagedPipeline:
+    """
+    分阶段流水线（例如 截图 -> OCR -> 翻译），每个阶段在自己的线程中运行，阶段之间是有界队列。
+    新任务总是优先：队列满时丢弃最旧的任务，每个阶段开始和结束时都会丢弃已经过时的任务
+    （有更新的任务提交后，旧任务即为过时），所以最新的截图总能最先得到结果。
+    完成的任务通过 on_result 交给调用方（例如发送 Qt 信号回到界面线程显示）。
+    """
+
+    _STOP = object()
+
+    def __init__(self, stages, on_result, on_error=None, name="pipeline"):
+        self.stages = stages
+        self.on_result = on_result
+        self.on_error = on_error
+        self.name = name
+        self._latest_id = 0
+        self._lock = threading.Lock()
+        self._running = True
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.errors = 0
+
+        for index, stage in enumerate(self.stages):
+            stage.thread = threading.Thread(target=self._worker, args=(index,),
+                                            name=f"{name}-{stage.name}", daemon=True)
+            stage.thread.start()
+
+    def submit(self, payload):
+        """提交新任务（之前尚未完成的任务随之过时），返回 PipelineJob"""
+        with self._lock:
+            self._latest_id += 1
+            job = PipelineJob(self._latest_id, payload)
+            self.submitted += 1
+        self._offer(self.stages[0].queue, job)
+        return job
+
+    def is_stale(self, job):
+        """有更新的任务提交后，旧任务即为过时"""
+        return job.job_id != self._latest_id
+
+    def _count(self, attribute):
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + 1)
+
+    def _offer(self, target_queue, job):
+        """放入有界队列，队列满时丢弃其中最旧的任务"""
+        while True:
+            try:
+                target_queue.put_nowait(job)
+                return
+            except queue.Full:
+                try:
+                    dropped = target_queue.get_nowait()
+                except queue.Empty:
+                    continue
+                if dropped is self._STOP:
+                    # 正在关闭，保留停止标记
+                    target_queue.put_nowait(dropped)
+                    return
+                self._count('cancelled')
+
+    def _worker(self, index):
+        stage = self.stages[index]
+        next_queue = self.stages[index + 1].queue if index + 1 < len(self.stages) else None
+        while True:
+            job = stage.queue.get()
+            if job is self._STOP:
+                break
+            if self.is_stale(job):
+                self._count('cancelled')
+                continue
+
+            start = time.perf_counter()
+            try:
+                forward = stage.func(job)
+            except Exception as e:
+                job.error = e
+                self._count('errors')
+                print(f"流水线阶段 {stage.name} 出错: {e}")
+                if self.on_error:
+                    self.on_error(job, e)
+                continue
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                job.stage_timings.append((stage.name, elapsed))
+                stage.processed += 1
+                stage.total_ms += elapsed
+
+            if self.is_stale(job):
+                self._count('cancelled')
+            elif forward and next_queue is not None:
+                self._offer(next_queue, job)
+            else:
+                self._count('completed')
+                self.on_result(job)
+
+    def stats(self):
+        """流水线统计: 提交/完成/取消/出错数量和各阶段平均耗时"""
+        with self._lock:
+            stats = {
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'cancelled': self.cancelled,
+                'errors': self.errors,
+            }
+        stats['stages'] = {
+            stage.name: stage.total_ms / stage.processed if stage.processed else 0.0
+            for stage in self.stages
+        }
+        return stats
+
+    def close(self, timeout=1.0):
+        """停止所有阶段的工作线程（正在运行的阶段完成当前任务后退出）"""
+        if not self._running:
+            return
+        self._running = False
+        with self._lock:
+            self._latest_id += 1  # 让所有排队中的任务过时
+        for stage in self.stages:
+            while True:
+                try:
+                    stage.queue.put_nowait(self._STOP)
+                    break
+                except queue.Full:
+                    try:
+                        stage.queue.get_nowait()
+                    except queue.Empty:
+                        pass
+        for stage in self.stages:
+            stage.thread.join(timeout)